@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Optimise the book's images into responsive variants and enforce a size budget.
+
+The figures are saved as full-size PNGs (150 dpi, up to ~2000 px wide)
+and the pages embed them with `![alt](images/...)`, so every reader
+downloads every chart at full size whatever their screen; the Voronoi
+maps alone are 2 MB each. This script runs after build_notebooks.py and
+before the book build. For every local PNG or JPEG that a page of
+_toc.yml embeds with markdown image syntax (in a .md page or in a markdown
+cell of a notebook) it writes, once per distinct image:
+
+  - the original, losslessly optimised if it is a PNG (an alpha channel
+    that is fully opaque is dropped, the rest re-encoded with Pillow's
+    optimize=True); JPEGs are copied as they are,
+  - a WebP at each of WIDTHS narrower than the original, and one at the
+    original width if that is below the largest of WIDTHS,
+  - the SVG saved next to the PNG, if there is one (figures.py writes it
+    from the same figure as the PNG).
+
+Each image's variants live under .cache/images in a directory named after
+a hash of the image (and of its SVG) and the settings below, so unchanged
+images are not converted again; the directories used by the pages are
+copied to _static/build/images, which is published with the site.
+
+Every markdown image is then replaced in place with a <picture> whose
+WebP `srcset` lets the browser pick the width it needs, with the
+optimised original as the fallback <img>. Charts that have an SVG no
+larger (gzipped, as GitHub Pages serves it) than their widest WebP get a
+plain <img> of the SVG instead, which is sharp at any width. Like
+build_notebooks.py, this rewrites the pages of the checkout; use --check
+to only convert and report.
+
+A page's image payload is the most its images can cost a reader: the
+widest WebP (or the gzipped SVG) of each distinct image. A table of the
+payload of every page with images is printed, and the script exits with
+status 1 if any page exceeds the budget (--budget, in KB). Images in
+notebook outputs are rendered by myst-nb and are not counted.
+
+Usage (from the repository root):
+    python build_notebooks.py --jobs 2
+    python build_images.py --budget 600
+    jupyter-book build . --all
+"""
+
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import build_notebooks
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.cache', 'images')
+# Published with the site, so the pages link to the variants here
+OUTPUT_DIR = os.path.join(HERE, '_static', 'build', 'images')
+
+# Bump whenever the variants written for an image change
+IMAGES_VERSION = 1
+WIDTHS = (400, 800, 1200, 1600)
+WEBP_QUALITY = 85
+# Width of the book theme's content column, in CSS pixels
+SIZES = '(max-width: 800px) 100vw, 800px'
+DEFAULT_BUDGET_KB = 600
+
+RASTER_SUFFIXES = ('.png', '.jpg', '.jpeg')
+IMAGE_PATTERN = re.compile(r'!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+"[^"]*")?\)')
+META_NAME = 'variants.json'
+
+
+def settings():
+    """Everything besides the image itself that its variants depend on."""
+    return {'version': IMAGES_VERSION, 'widths': list(WIDTHS), 'webp_quality': WEBP_QUALITY}
+
+
+def vector_path(source):
+    """The SVG saved next to `source`, or None."""
+    path = os.path.splitext(source)[0] + '.svg'
+    return path if os.path.exists(path) else None
+
+
+def image_key(source):
+    """Cache key of the variants of `source` (see the module docstring)."""
+    svg = vector_path(source)
+    key = {
+        'image': build_notebooks.file_digest(source),
+        'svg': build_notebooks.file_digest(svg) if svg else None,
+        'settings': settings(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def gzip_size(path):
+    """Size of `path` once gzipped, as a web server sends text files."""
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read(), compresslevel=9))
+
+
+def build_variants(source, directory):
+    """Write the variants of `source` into `directory`; return their description."""
+    from PIL import Image
+
+    stem, suffix = os.path.splitext(os.path.basename(source))
+    image = Image.open(source)
+    image.load()
+    if image.mode == 'RGBA' and image.getextrema()[3] == (255, 255):
+        image = image.convert('RGB')
+
+    fallback = stem + suffix.lower()
+    if suffix.lower() == '.png':
+        image.save(os.path.join(directory, fallback), optimize=True, dpi=image.info.get('dpi'))
+        # Keep the original when Pillow cannot beat it
+        if os.path.getsize(os.path.join(directory, fallback)) > os.path.getsize(source):
+            shutil.copyfile(source, os.path.join(directory, fallback))
+    else:
+        shutil.copyfile(source, os.path.join(directory, fallback))
+
+    width, height = image.size
+    widths = [w for w in WIDTHS if w < width]
+    if width < max(WIDTHS):
+        widths.append(width)
+    webp = []
+    for w in widths:
+        filename = f'{stem}-{w}w.webp'
+        resized = image if w == width else image.resize((w, round(height * w / width)),
+                                                        Image.LANCZOS)
+        resized.save(os.path.join(directory, filename), quality=WEBP_QUALITY, method=6)
+        webp.append([filename, w, os.path.getsize(os.path.join(directory, filename))])
+
+    svg = None
+    if vector_path(source):
+        svg = [stem + '.svg', gzip_size(vector_path(source))]
+        shutil.copyfile(vector_path(source), os.path.join(directory, svg[0]))
+
+    return {
+        'source': os.path.relpath(source, HERE),
+        'source_bytes': os.path.getsize(source),
+        'width': width,
+        'height': height,
+        'fallback': [fallback, os.path.getsize(os.path.join(directory, fallback))],
+        'webp': webp,
+        'svg': svg,
+    }
+
+
+def variants(source, cache_dir=CACHE_DIR, refresh=False):
+    """(key, description) of the variants of `source`, converting it unless cached."""
+    key = image_key(source)
+    entry = os.path.join(cache_dir, key[:16])
+    meta_path = os.path.join(entry, META_NAME)
+    if not refresh and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            return key, json.load(f)
+
+    tmp = f'{entry}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    meta = build_variants(source, tmp)
+    with open(os.path.join(tmp, META_NAME), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    return key, meta
+
+
+def uses_svg(meta):
+    """Whether the image is served as its SVG rather than as WebP."""
+    return meta['svg'] is not None and (not meta['webp'] or meta['svg'][1] <= meta['webp'][-1][2])
+
+
+def payload(meta):
+    """Most bytes a reader downloads for the image (see the module docstring)."""
+    if uses_svg(meta):
+        return meta['svg'][1]
+    return meta['webp'][-1][2] if meta['webp'] else meta['fallback'][1]
+
+
+def markup(meta, url, alt):
+    """HTML for the image whose variants are at `url`, relative to the page."""
+    alt = html.escape(alt, quote=True)
+    size = f'width="{meta["width"]}" height="{meta["height"]}"'
+    attrs = f'{size} loading="lazy" decoding="async" style="max-width: 100%; height: auto;"'
+    if uses_svg(meta):
+        return f'<img src="{url}/{meta["svg"][0]}" alt="{alt}" {attrs}>'
+    srcset = ', '.join(f'{url}/{filename} {w}w' for filename, w, _ in meta['webp'])
+    return (f'<picture><source type="image/webp" srcset="{srcset}" sizes="{SIZES}">'
+            f'<img src="{url}/{meta["fallback"][0]}" alt="{alt}" {attrs}></picture>')
+
+
+def page_sources(page):
+    """Markdown text blocks of `page`: the page itself, or a notebook's markdown cells."""
+    path = os.path.join(HERE, page)
+    if page.endswith('.ipynb'):
+        import nbformat
+
+        nb = nbformat.read(path, as_version=4)
+        return nb, [cell for cell in nb.cells if cell.cell_type == 'markdown']
+    with open(path, encoding='utf-8') as f:
+        return None, [{'source': f.read()}]
+
+
+def local_image(page, src):
+    """Absolute path of image `src` embedded in `page`, or None if it is not a local raster."""
+    if '://' in src or not src.lower().endswith(RASTER_SUFFIXES):
+        return None
+    path = os.path.normpath(os.path.join(HERE, os.path.dirname(page), src))
+    return path if os.path.exists(path) else None
+
+
+def page_images(pages):
+    """Local raster images embedded by each page, as {page: [path, ...]}."""
+    images = {}
+    for page in pages:
+        _, blocks = page_sources(page)
+        found = []
+        for block in blocks:
+            for match in IMAGE_PATTERN.finditer(block['source']):
+                path = local_image(page, match.group('src'))
+                if path and path not in found:
+                    found.append(path)
+        if found:
+            images[page] = found
+    return images
+
+
+def rewrite_page(page, converted):
+    """Replace the markdown images of `page` with their responsive markup."""
+    directory = os.path.join(HERE, os.path.dirname(page))
+
+    def replace(match):
+        path = local_image(page, match.group('src'))
+        if path not in converted:
+            return match.group(0)
+        key, meta = converted[path]
+        url = os.path.relpath(os.path.join(OUTPUT_DIR, key[:16]), directory).replace(os.sep, '/')
+        return markup(meta, url, match.group('alt'))
+
+    nb, blocks = page_sources(page)
+    for block in blocks:
+        block['source'] = IMAGE_PATTERN.sub(replace, block['source'])
+    path = os.path.join(HERE, page)
+    if nb is not None:
+        import nbformat
+
+        nbformat.write(nb, path)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(blocks[0]['source'])
+
+
+def publish(converted, cache_dir=CACHE_DIR, output_dir=OUTPUT_DIR):
+    """Copy the variants in use to `output_dir` and drop the other cache entries."""
+    used = {key[:16] for key, _ in converted.values()}
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+    for name in sorted(used):
+        shutil.copytree(os.path.join(cache_dir, name), os.path.join(output_dir, name),
+                        ignore=shutil.ignore_patterns(META_NAME))
+    for name in os.listdir(cache_dir):
+        if name not in used:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def report(images, converted, budget_kb):
+    """Print the image payload of every page; return the pages over the budget."""
+    over = []
+    print(f"\n{'page':<55} {'images':>6} {'original':>10} {'served':>10}")
+    for page, paths in images.items():
+        metas = {converted[path][0]: converted[path][1] for path in paths}
+        original = sum(meta['source_bytes'] for meta in metas.values())
+        served = sum(payload(meta) for meta in metas.values())
+        flag = ''
+        if served > budget_kb * 1024:
+            over.append(page)
+            flag = f'  over budget ({budget_kb:g} KB)'
+        print(f"{page:<55} {len(metas):>6} {original / 1024:>8.0f}KB {served / 1024:>8.0f}KB{flag}")
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', help='pages to process (default: all pages in _toc.yml)')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_KB,
+                        help='largest image payload allowed per page, in KB (default: %(default)s)')
+    parser.add_argument('--check', action='store_true',
+                        help='convert and report, but leave the pages unchanged')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='images converted at the same time')
+    parser.add_argument('--refresh', action='store_true', help='ignore cached variants')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    pages = [os.path.relpath(os.path.abspath(path), HERE) for path in args.pages]
+    images = page_images(pages or build_notebooks.book_pages())
+    sources = sorted({path for paths in images.values() for path in paths})
+
+    start = time.perf_counter()
+    os.makedirs(args.cache_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = pool.map(variants, sources, [args.cache_dir] * len(sources),
+                           [args.refresh] * len(sources))
+        converted = dict(zip(sources, results))
+    print(f"{len(sources)} images ready in {time.perf_counter() - start:.1f}s")
+
+    publish(converted, args.cache_dir)
+    if not args.check:
+        for page in images:
+            rewrite_page(page, converted)
+
+    over = report(images, converted, args.budget)
+    if over:
+        print(f"\n{len(over)} page(s) over the {args.budget:g} KB image budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Execute the book's notebooks ahead of the Jupyter Book build, with a result
+cache and in parallel.
+
+With `execute_notebooks: auto`, `jupyter-book build . --all` runs every
+notebook of _toc.yml one after the other on every push, hyperparameter
+searches included. This script runs them first. Each executed notebook
+is stored under .cache/notebooks, keyed on a hash of:
+
+  - its code cells' source and its kernel,
+  - the project's modules and data files in its directory (INPUT_PATTERNS),
+  - requirements.txt and the execute settings of _config.yml,
+  - the keys of the notebooks it depends on.
+
+A notebook whose key is in the cache is not run again. Notebooks that do
+not depend on each other run in parallel, each in its own kernel. A
+notebook in DEPENDS_ON only starts once the notebooks it reads from have
+finished. The files a notebook writes for later ones (ARTIFACTS, e.g. the
+Titanic models) are cached with it and restored on a hit.
+
+The executed notebooks are written back in place, with their outputs and
+with a notebook-level `mystnb: {execution_mode: 'off'}`, so the book build
+renders them without executing them again. This is meant for the CI
+checkout: run it locally only if you do not mind notebooks with outputs in
+your working tree. A table of per-notebook timings is printed at the end.
+
+Every executed cell is also profiled: wall time, the kernel's peak RSS
+while it ran (from /proc, so Linux only) and the size of its outputs.
+Cached notebooks keep the profile of the run that produced them. The
+profile is written to _static/build/notebook_profile.json, which is
+published with the site. It is also rendered as the book's "Notebook
+Build Report" page (build-report.md), which lists the slowest cells with
+their change since the previous build.
+
+Usage (from the repository root):
+    python build_notebooks.py --jobs 2
+    jupyter-book build . --all
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.cache', 'notebooks')
+# Profile of the last build (a copy is kept in the cache directory too, to
+# compare the next build against) and the book page rendered from it
+REPORT_JSON = os.path.join(HERE, '_static', 'build', 'notebook_profile.json')
+REPORT_PAGE = os.path.join(HERE, 'build-report.md')
+# Number of cells listed on the report page
+SLOWEST_CELLS = 25
+
+# Files next to a notebook that its results depend on
+INPUT_PATTERNS = ('*.py', 'data/*')
+# Notebooks that read files written by other notebooks (paths from the root)
+DEPENDS_ON = {
+    'projects/titanic/04_results.ipynb': ['projects/titanic/03_modeling.ipynb'],
+}
+# Files and directories (relative to the notebook) a notebook writes for others
+ARTIFACTS = {
+    'projects/titanic/03_modeling.ipynb': ['models'],
+}
+
+
+def book_pages(toc_path=os.path.join(HERE, '_toc.yml')):
+    """Pages (.md or .ipynb) listed in the table of contents, in order, relative to the root."""
+    import yaml
+
+    with open(toc_path) as f:
+        toc = yaml.safe_load(f)
+
+    pages = []
+
+    def visit(node):
+        if isinstance(node, dict):
+            # The root page is listed under `root`, the others under `file`
+            for key in ('root', 'file'):
+                if key not in node:
+                    continue
+                stem = os.path.splitext(node[key])[0]
+                for suffix in ('.ipynb', '.md'):
+                    if os.path.exists(os.path.join(HERE, stem + suffix)):
+                        pages.append(stem + suffix)
+                        break
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for item in node:
+                visit(item)
+
+    visit(toc)
+    return pages
+
+
+def book_notebooks(toc_path=os.path.join(HERE, '_toc.yml')):
+    """Notebooks listed in the table of contents, in order, relative to the root."""
+    return [page for page in book_pages(toc_path) if page.endswith('.ipynb')]
+
+
+def execute_config(config_path=os.path.join(HERE, '_config.yml')):
+    """The `execute` section of the book configuration."""
+    import yaml
+
+    with open(config_path) as f:
+        return yaml.safe_load(f).get('execute', {})
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def notebook_key(notebook, settings, dependency_keys=()):
+    """Cache key of a notebook's executed result (see the module docstring)."""
+    with open(os.path.join(HERE, notebook)) as f:
+        nb = json.load(f)
+    digest = hashlib.sha256(json.dumps({
+        'kernel': nb.get('metadata', {}).get('kernelspec', {}).get('name'),
+        'execute': settings,
+        'depends': list(dependency_keys),
+        'requirements': file_digest(os.path.join(HERE, 'requirements.txt')),
+    }, sort_keys=True).encode())
+    for cell in nb['cells']:
+        if cell['cell_type'] == 'code':
+            digest.update(''.join(cell['source']).encode() + b'\0')
+
+    directory = os.path.join(HERE, os.path.dirname(notebook))
+    for pattern in INPUT_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            if os.path.isfile(path):
+                digest.update(f'{os.path.relpath(path, directory)}:{file_digest(path)}\0'.encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(notebook, key, cache_dir=CACHE_DIR):
+    """Cache entry directory of `notebook` for `key`."""
+    name = notebook.replace('/', '__')
+    return os.path.join(cache_dir, f'{os.path.splitext(name)[0]}-{key}')
+
+
+def kernel_pid(client):
+    """Process id of the kernel `client` runs, or None if it is not a local process."""
+    provisioner = getattr(client.km, 'provisioner', None)
+    process = getattr(provisioner, 'process', None) or getattr(client.km, 'kernel', None)
+    return getattr(process, 'pid', None)
+
+
+def reset_peak_rss(pid):
+    """Reset the peak RSS of process `pid` to its current RSS (Linux)."""
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid):
+    """Peak RSS of process `pid` in MB since the last reset, or None if unknown."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def execute_notebook(notebook, timeout, allow_errors):
+    """
+    Run `notebook` in a fresh kernel from its directory.
+
+    Returns its JSON, its wall time and the profile of every code cell
+    (index, first line, source hash, seconds, peak RSS in MB, output size
+    in KB).
+    """
+    import nbformat
+    from nbclient import NotebookClient
+
+    path = os.path.join(HERE, notebook)
+    nb = nbformat.read(path, as_version=4)
+    client = NotebookClient(nb, timeout=timeout, allow_errors=allow_errors,
+                            resources={'metadata': {'path': os.path.dirname(path)}})
+    cells = {}
+
+    def cell_started(cell, cell_index):
+        reset_peak_rss(kernel_pid(client))
+        cells[cell_index] = time.perf_counter()
+
+    def cell_finished(cell, cell_index, execute_reply):
+        cells[cell_index] = (time.perf_counter() - cells[cell_index], peak_rss_mb(kernel_pid(client)))
+
+    client.on_cell_execute = cell_started
+    client.on_cell_executed = cell_finished
+    start = time.perf_counter()
+    client.execute()
+    seconds = time.perf_counter() - start
+
+    profile = []
+    for index, (cell_seconds, peak) in sorted(cells.items()):
+        source = nb.cells[index].source
+        lines = [line.strip() for line in source.splitlines() if line.strip()]
+        profile.append({
+            'index': index,
+            'line': lines[0][:80] if lines else '',
+            'source_hash': hashlib.sha256(source.encode()).hexdigest()[:12],
+            'seconds': cell_seconds,
+            'peak_rss_mb': peak,
+            'output_kb': len(json.dumps(nb.cells[index].get('outputs', []))) / 1024,
+        })
+    # The book build renders the stored outputs instead of executing again
+    nb.metadata['mystnb'] = {'execution_mode': 'off'}
+    return nbformat.writes(nb), seconds, profile
+
+
+def store(notebook, key, text, seconds, cells, cache_dir=CACHE_DIR):
+    """Save an executed notebook and its artifacts as a cache entry."""
+    entry = cache_path(notebook, key, cache_dir)
+    tmp = f'{entry}.tmp{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, 'notebook.ipynb'), 'w', encoding='utf-8') as f:
+        f.write(text)
+    directory = os.path.join(HERE, os.path.dirname(notebook))
+    for artifact in ARTIFACTS.get(notebook, []):
+        source = os.path.join(directory, artifact)
+        target = os.path.join(tmp, 'artifacts', artifact)
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        elif os.path.isfile(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'notebook': notebook, 'seconds': seconds, 'cells': cells}, f)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.rename(tmp, entry)
+
+
+def restore(notebook, key, cache_dir=CACHE_DIR):
+    """Write a cached notebook and its artifacts back; returns its metadata (run time, profile)."""
+    entry = cache_path(notebook, key, cache_dir)
+    shutil.copyfile(os.path.join(entry, 'notebook.ipynb'), os.path.join(HERE, notebook))
+    artifacts = os.path.join(entry, 'artifacts')
+    if os.path.isdir(artifacts):
+        shutil.copytree(artifacts, os.path.join(HERE, os.path.dirname(notebook)),
+                        dirs_exist_ok=True)
+    with open(os.path.join(entry, 'meta.json')) as f:
+        return json.load(f)
+
+
+def prune(notebook, key, cache_dir=CACHE_DIR):
+    """Delete the cache entries of `notebook` for keys other than `key`."""
+    current = cache_path(notebook, key, cache_dir)
+    prefix = current[:-len(key)]
+    for entry in glob.glob(glob.escape(prefix) + '*'):
+        if entry != current and len(entry) == len(current):
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def build_profile(notebooks, report):
+    """Machine-readable profile of a build (see the module docstring)."""
+    from datetime import datetime, timezone
+
+    entries = []
+    for notebook in notebooks:
+        status, _, meta = report[notebook]
+        cells = meta.get('cells', []) if meta else []
+        peaks = [cell['peak_rss_mb'] for cell in cells if cell['peak_rss_mb'] is not None]
+        entries.append({
+            'notebook': notebook,
+            'status': status,
+            'seconds': meta['seconds'] if meta else None,
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'output_kb': sum(cell['output_kb'] for cell in cells),
+            'cells': cells,
+        })
+    return {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': os.environ.get('GITHUB_SHA'),
+        'notebooks': entries,
+    }
+
+
+def render_report(profile, previous=None, top=SLOWEST_CELLS):
+    """Markdown page of a build profile, compared with the `previous` one."""
+    def number(value, digits=1):
+        return '-' if value is None else f'{value:,.{digits}f}'
+
+    before = {}
+    for entry in (previous or {}).get('notebooks', []):
+        for cell in entry['cells']:
+            before[entry['notebook'], cell['source_hash']] = cell['seconds']
+
+    lines = [
+        '# Notebook Build Report',
+        '',
+        'Execution profile of the notebooks in the last build of this book, written by',
+        '`build_notebooks.py`. Cached notebooks show the run that produced their outputs.',
+        f"Generated {profile['generated']}"
+        + (f" for commit `{profile['commit'][:7]}`" if profile.get('commit') else '')
+        + '; the raw data is in [notebook_profile.json](_static/build/notebook_profile.json).',
+        '',
+        '## Notebooks',
+        '',
+        '| Notebook | Status | Run time (s) | Peak RSS (MB) | Output (KB) |',
+        '|---|---|---:|---:|---:|',
+    ]
+    for entry in profile['notebooks']:
+        lines.append(f"| {entry['notebook']} | {entry['status']} | {number(entry['seconds'])} "
+                     f"| {number(entry['peak_rss_mb'], 0)} | {number(entry['output_kb'], 0)} |")
+
+    cells = [(entry['notebook'], cell) for entry in profile['notebooks'] for cell in entry['cells']]
+    cells.sort(key=lambda item: item[1]['seconds'], reverse=True)
+    lines += [
+        '',
+        '## Slowest Cells',
+        '',
+        '| Notebook | Cell | Code | Time (s) | Change (s) | Peak RSS (MB) | Output (KB) |',
+        '|---|---:|---|---:|---:|---:|---:|',
+    ]
+    for notebook, cell in cells[:top]:
+        earlier = before.get((notebook, cell['source_hash']))
+        change = 'new' if earlier is None else f"{cell['seconds'] - earlier:+.1f}"
+        code = cell['line'].replace('|', '\\|').replace('`', "'")
+        lines.append(f"| {os.path.basename(notebook)} | {cell['index']} | `{code}` "
+                     f"| {number(cell['seconds'])} | {change} | {number(cell['peak_rss_mb'], 0)} "
+                     f"| {number(cell['output_kb'], 0)} |")
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(profile, cache_dir=CACHE_DIR):
+    """Write the profile JSON and the report page, comparing with the previous build."""
+    previous_path = os.path.join(cache_dir, 'profile.json')
+    previous = None
+    if os.path.exists(previous_path):
+        with open(previous_path) as f:
+            previous = json.load(f)
+
+    text = json.dumps(profile, indent=2)
+    for path in (REPORT_JSON, previous_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    with open(REPORT_PAGE, 'w', encoding='utf-8') as f:
+        f.write(render_report(profile, previous))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('notebooks', nargs='*',
+                        help='notebooks to build (default: all notebooks in _toc.yml)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='notebooks executed at the same time')
+    parser.add_argument('--refresh', action='store_true', help='ignore cached results')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    notebooks = [os.path.relpath(os.path.abspath(path), HERE) for path in args.notebooks]
+    notebooks = notebooks or book_notebooks()
+    # Notebooks others depend on are built too
+    for notebook in list(notebooks):
+        for dependency in DEPENDS_ON.get(notebook, []):
+            if dependency not in notebooks:
+                notebooks.insert(notebooks.index(notebook), dependency)
+    settings = execute_config()
+    timeout = settings.get('timeout', 300)
+    allow_errors = settings.get('allow_errors', False)
+
+    keys = {}
+
+    def key_of(notebook):
+        if notebook not in keys:
+            keys[notebook] = notebook_key(
+                notebook, settings, [key_of(dep) for dep in DEPENDS_ON.get(notebook, [])])
+        return keys[notebook]
+
+    # (status, seconds spent now, metadata of the run that produced the result)
+    report = {}
+    pending = []
+    for notebook in notebooks:
+        entry = cache_path(notebook, key_of(notebook), args.cache_dir)
+        if not args.refresh and os.path.isdir(entry):
+            start = time.perf_counter()
+            meta = restore(notebook, keys[notebook], args.cache_dir)
+            report[notebook] = ('cached', time.perf_counter() - start, meta)
+        else:
+            pending.append(notebook)
+
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        running = {}
+        while pending or running:
+            for notebook in list(pending):
+                dependencies = DEPENDS_ON.get(notebook, [])
+                if any(report.get(dep, ('',))[0] in ('failed', 'skipped') for dep in dependencies):
+                    report[notebook] = ('skipped', 0.0, None)
+                    pending.remove(notebook)
+                elif all(dep in report for dep in dependencies):
+                    print(f"Executing {notebook}")
+                    running[pool.submit(execute_notebook, notebook, timeout, allow_errors)] = notebook
+                    pending.remove(notebook)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                notebook = running.pop(future)
+                try:
+                    text, seconds, cells = future.result()
+                except Exception as e:
+                    print(f"Failed: {notebook}\n{e}", file=sys.stderr)
+                    report[notebook] = ('failed', 0.0, None)
+                    continue
+                store(notebook, keys[notebook], text, seconds, cells, args.cache_dir)
+                with open(os.path.join(HERE, notebook), 'w', encoding='utf-8') as f:
+                    f.write(text)
+                report[notebook] = ('executed', seconds, {'seconds': seconds, 'cells': cells})
+
+    for notebook in notebooks:
+        if report[notebook][0] in ('cached', 'executed'):
+            prune(notebook, keys[notebook], args.cache_dir)
+
+    width = max(len(notebook) for notebook in notebooks)
+    print(f"\n{'notebook':<{width}} {'status':>9} {'time (s)':>9} {'run (s)':>8}")
+    for notebook in notebooks:
+        status, seconds, meta = report[notebook]
+        run = f"{meta['seconds']:>8.1f}" if meta else f"{'-':>8}"
+        print(f"{notebook:<{width}} {status:>9} {seconds:>9.1f} {run}")
+    total = sum(seconds for _, seconds, _ in report.values())
+    saved = sum(meta['seconds'] for status, _, meta in report.values() if status == 'cached')
+    print(f"{'total':<{width}} {'':>9} {total:>9.1f}   ({saved:.1f} s saved by the cache)")
+
+    write_report(build_profile(notebooks, report), args.cache_dir)
+    print(f"Profile written to {os.path.relpath(REPORT_JSON, HERE)} and {os.path.relpath(REPORT_PAGE, HERE)}")
+
+    if any(status in ('failed', 'skipped') for status, _, _ in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the KD-tree territory lookup against intersecting locations with
+the Voronoi polygons.
+
+Assigning fan or ticket-holder locations to team territories used to mean
+a spatial join of the points with the clipped polygons in voronoi_gdf.
+territories.TerritoryLookup answers the same question with a nearest-site
+query on a cKDTree. It tests against the boundary only the points that a
+coarse grid cannot place inside or outside France. Random WGS84 locations
+are drawn around a synthetic France-sized boundary and assigned with both
+methods, which are checked to agree. The polygon join only runs up to
+--baseline-max points, and the lookup is also timed on --jobs threads.
+
+Usage (from projects/french-rugby-voronoi):
+    python benchmarks/bench_lookup.py --sizes 100000 1000000 10000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import territories
+
+
+def make_boundary(n_vertices=10_000, seed=42):
+    """Jagged, France-sized polygon in Web Mercator."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 500_000 * (1 + 0.15 * rng.random(n_vertices))
+    return shapely.Polygon(np.column_stack([300_000 + radius * np.cos(angles),
+                                            5_900_000 + radius * np.sin(angles)]))
+
+
+def make_locations(n_points, seed=42):
+    """Longitudes and latitudes over and around the boundary."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-6.0, 11.0, n_points), rng.uniform(40.5, 52.0, n_points)
+
+
+def polygon_join(lon, lat, voronoi_gdf):
+    """Territory of each location by a spatial join with the polygons."""
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs='EPSG:4326')
+    joined = gpd.sjoin(points.to_crs(voronoi_gdf.crs), voronoi_gdf, how='left', predicate='intersects')
+    # A point on a shared edge matches both territories: keep the first
+    joined = joined[~joined.index.duplicated()]
+    return joined['index_right'].fillna(-1).to_numpy(dtype=np.intp)
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--sites', type=int, default=30, help='number of teams')
+    parser.add_argument('--baseline-max', type=int, default=1_000_000,
+                        help='largest number of points to run the polygon join for')
+    parser.add_argument('--jobs', type=int, default=-1, help='threads for the parallel lookup')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    boundary = make_boundary()
+    x_min, y_min, x_max, y_max = boundary.bounds
+    rng = np.random.default_rng(0)
+    sites = territories.snap_inside(
+        shapely.points(rng.uniform([x_min, y_min], [x_max, y_max], (args.sites, 2))), boundary)
+    engine = territories.Territories(sites, boundary)
+    voronoi_gdf = engine.to_geodataframe()
+    lookup = territories.TerritoryLookup(sites, boundary)
+
+    print(f"Assigning locations to {args.sites} territories")
+    print(f"{'points':>12} {'polygons (s)':>13} {'kd-tree (s)':>12} {'speed-up':>9} "
+          f"{'parallel (s)':>13}")
+
+    for n_points in args.sizes:
+        lon, lat = make_locations(n_points)
+
+        lookup_s, result = best_time(lambda: lookup.assign_territory(lon, lat), args.repeat)
+        parallel_s, parallel = best_time(
+            lambda: lookup.assign_territory(lon, lat, n_jobs=args.jobs, chunk_size=250_000), args.repeat)
+        np.testing.assert_array_equal(parallel, result)
+
+        if n_points > args.baseline_max:
+            print(f"{n_points:>12,} {'-':>13} {lookup_s:>12.3f} {'-':>9} {parallel_s:>13.3f}")
+            continue
+
+        join_s, expected = best_time(lambda: polygon_join(lon, lat, voronoi_gdf), args.repeat)
+        np.testing.assert_array_equal(result, expected)
+        print(f"{n_points:>12,} {join_s:>13.3f} {lookup_s:>12.3f} {join_s / lookup_s:>8.1f}x "
+              f"{parallel_s:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
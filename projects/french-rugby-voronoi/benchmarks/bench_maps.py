@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batched folium territory map against the per-territory layers
+it replaced in the interactive map cell.
+
+The notebook used to add one folium.GeoJson per territory, each with its own
+style-function closure and its own tooltip and popup HTML, plus one
+CircleMarker per team. maps.territory_map() puts all territories in one
+FeatureCollection and all teams in another, styled from a feature
+property, and simplifies and quantises the geometry. Territories are built
+for random sites over a synthetic France-sized boundary. For each size
+the page is rendered with the per-territory layers, with the batched layers
+at full detail, with --tolerance metres of simplification, and with one
+layer per --zoom-tolerances entry. The report gives the size of the HTML
+page and the time to build and render it. The batched territories are
+checked to still tile the boundary.
+
+Usage (from projects/french-rugby-voronoi):
+    python benchmarks/bench_maps.py --sizes 30 500 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import folium
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import maps
+import territories
+
+LEAGUE_COLORS = {'Top 14': '#1f77b4', 'Pro D2': '#2ca02c'}
+
+
+def make_boundary(n_vertices=10_000, seed=42):
+    """Jagged, France-sized polygon in Web Mercator."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 500_000 * (1 + 0.15 * rng.random(n_vertices))
+    return shapely.Polygon(np.column_stack([300_000 + radius * np.cos(angles),
+                                            5_900_000 + radius * np.sin(angles)]))
+
+
+def make_layers(n_sites, boundary, seed=42):
+    """Territory and team GeoDataFrames for `n_sites` random teams."""
+    rng = np.random.default_rng(seed)
+    x_min, y_min, x_max, y_max = boundary.bounds
+    sites = territories.snap_inside(
+        shapely.points(rng.uniform([x_min, y_min], [x_max, y_max], (n_sites, 2))), boundary)
+    teams = pd.DataFrame({
+        'Team': [f'Team {i}' for i in range(n_sites)],
+        'League': np.where(np.arange(n_sites) % 2, 'Top 14', 'Pro D2'),
+        'City': [f'City {i}' for i in range(n_sites)],
+    })
+    teams['color'] = teams['League'].map(LEAGUE_COLORS)
+    engine = territories.Territories(sites, boundary)
+    territory_gdf = engine.to_geodataframe(teams)
+    territory_gdf['Territory'] = [f'{area:,.0f} km²' for area in engine.area_km2]
+    return territory_gdf, gpd.GeoDataFrame(teams, geometry=sites, crs=territories.PROJECTED_CRS)
+
+
+def per_row_map(territory_gdf, team_gdf):
+    """The original map: one layer per territory and one marker per team."""
+    m = folium.Map(location=[46.5, 2.5], zoom_start=6)
+    for _, row in territory_gdf.to_crs('EPSG:4326').iterrows():
+        def make_style_function(team_color):
+            def style_function(feature):
+                return {'fillColor': team_color, 'color': 'black', 'weight': 2,
+                        'fillOpacity': 0.5, 'opacity': 0.8}
+            return style_function
+
+        folium.GeoJson(
+            row.geometry.__geo_interface__,
+            style_function=make_style_function(row['color']),
+            tooltip=folium.Tooltip(f"<h4>{row['Team']}</h4><p>League: {row['League']}</p>"
+                                   f"<p>City: {row['City']}</p><p>Territory: {row['Territory']}</p>",
+                                   sticky=True),
+            popup=folium.Popup(f"<h3>{row['Team']}</h3><table><tr><td>League:</td>"
+                               f"<td>{row['League']}</td></tr><tr><td>City:</td>"
+                               f"<td>{row['City']}</td></tr></table>", max_width=300),
+            highlight_function=lambda feature: {'fillOpacity': 0.8, 'weight': 3, 'color': 'white'},
+        ).add_to(m)
+    for _, row in team_gdf.to_crs('EPSG:4326').iterrows():
+        folium.CircleMarker(
+            location=[row.geometry.y, row.geometry.x], radius=10,
+            popup=folium.Popup(f"<b>{row['Team']}</b><br>League: {row['League']}", max_width=200),
+            tooltip=f"{row['Team']} ({row['League']})",
+            color='white', fillColor=row['color'], fill=True, fillOpacity=0.9, weight=2.5,
+        ).add_to(m)
+    return m
+
+
+def batched_map(territory_gdf, team_gdf, **kwargs):
+    """The map built by maps.territory_map()."""
+    return maps.territory_map(
+        territory_gdf, team_gdf,
+        tooltip_fields=['Team', 'League', 'City', 'Territory'],
+        site_fields=['Team', 'League', 'City'],
+        location=[46.5, 2.5], zoom_start=6, **kwargs)
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 500, 2_000])
+    parser.add_argument('--tolerance', type=float, default=1_000,
+                        help='simplification tolerance in metres')
+    parser.add_argument('--zoom-tolerances', type=float, nargs='+', default=[5_000, 1_000, 0],
+                        help='tolerances of the layers shown from zoom 5, 7, 9, ...')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    boundary = make_boundary()
+    zoom_tolerances = {5 + 2 * i: tolerance for i, tolerance in enumerate(args.zoom_tolerances)}
+    variants = [
+        ('per-territory', per_row_map, {}),
+        ('batched', batched_map, {}),
+        (f'simplified ({args.tolerance:.0f} m)', batched_map, {'tolerance': args.tolerance}),
+        (f'{len(zoom_tolerances)} zoom levels', batched_map, {'zoom_tolerances': zoom_tolerances}),
+    ]
+    print(f"{'sites':>7} {'map':<22} {'HTML (KB)':>10} {'time (s)':>9}")
+
+    for n_sites in args.sizes:
+        territory_gdf, team_gdf = make_layers(n_sites, boundary)
+
+        # Coverage simplification must keep the (distinct) territories
+        # gap- and overlap-free: their areas still add up to the union's
+        simplified = maps.simplify_coverage(territory_gdf.geometry.values, args.tolerance)
+        tiles = shapely.from_wkb(np.unique(shapely.to_wkb(simplified)))
+        np.testing.assert_allclose(shapely.area(tiles).sum(), shapely.union_all(tiles).area, rtol=1e-9)
+
+        for name, build, kwargs in variants:
+            def render():
+                return maps.html_size(build(territory_gdf, team_gdf, **kwargs))
+
+            seconds, size = best_time(render, args.repeat)
+            print(f"{n_sites:>7,} {name:<22} {size / 1024:>10,.0f} {seconds:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorised site snapping against the per-row loop it replaced
+in create_league_voronoi().
+
+The notebook used to build one Point per team and then, row by row, test
+it with within() and snap it with nearest_points() when it fell outside
+France. territories.site_points() and territories.snap_inside() do the same
+with shapely 2 array operations against a prepared boundary. Random sites
+are drawn around a synthetic coastline with as many vertices as the 10m
+Natural Earth outline of France, so a share of them need snapping. Both
+paths are checked to give the same points, and the best-of-N wall time is
+reported together with the time per site, which stays flat as the number
+of sites grows.
+
+Usage (from projects/french-rugby-voronoi):
+    python benchmarks/bench_snapping.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point
+from shapely.ops import nearest_points
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import territories
+
+
+def make_boundary(n_vertices, seed=42):
+    """Jagged, France-sized polygon in Web Mercator."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 500_000 * (1 + 0.15 * rng.random(n_vertices))
+    return shapely.Polygon(np.column_stack([300_000 + radius * np.cos(angles),
+                                            5_900_000 + radius * np.sin(angles)]))
+
+
+def make_sites(n_sites, seed=42):
+    """Longitudes and latitudes spread over and around the boundary."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-4.5, 10.0, n_sites), rng.uniform(41.5, 51.0, n_sites)
+
+
+def loop_snap(lon, lat, boundary):
+    """The original per-row construction and snapping."""
+    geometry = [Point(xy) for xy in zip(lon, lat)]
+    gdf = gpd.GeoDataFrame(geometry=geometry, crs='EPSG:4326').to_crs('EPSG:3857')
+    for idx, row in gdf.iterrows():
+        if not row.geometry.within(boundary):
+            p1, p2 = nearest_points(boundary, row.geometry)
+            gdf.at[idx, 'geometry'] = p1
+    return shapely.get_coordinates(gdf.geometry.values)
+
+
+def vectorised_snap(lon, lat, boundary):
+    """Batched construction and snapping."""
+    points = territories.site_points(lon, lat, crs='EPSG:3857')
+    return shapely.get_coordinates(territories.snap_inside(points, boundary))
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--vertices', type=int, default=10_000,
+                        help='number of vertices of the synthetic boundary')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    boundary = make_boundary(args.vertices)
+    print(f"Snapping sites onto a {args.vertices:,}-vertex boundary")
+    print(f"{'sites':>10} {'loop (s)':>10} {'batched (s)':>12} {'speed-up':>9} {'us/site':>8}")
+
+    for n_sites in args.sizes:
+        lon, lat = make_sites(n_sites)
+
+        loop_s, expected = best_time(lambda: loop_snap(lon, lat, boundary), args.repeat)
+        batched_s, result = best_time(lambda: vectorised_snap(lon, lat, boundary), args.repeat)
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6)
+
+        print(f"{n_sites:>10,} {loop_s:>10.3f} {batched_s:>12.3f} "
+              f"{loop_s / batched_s:>8.1f}x {batched_s / n_sites * 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
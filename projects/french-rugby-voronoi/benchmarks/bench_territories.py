@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the territory engine on many sites and a fine population grid.
+
+territories.Territories builds the clipped Voronoi tessellation of all sites
+in a few vectorised shapely calls and indexes the territories with an
+STRtree. aggregate_grid() then assigns every populated grid cell to its
+territory in one tree query. The baseline is the notebook's approach:
+geovoronoi's voronoi_regions_from_coords() for the tessellation, then one
+point-in-polygon test of the whole grid per territory. It becomes too
+slow for large site counts, so it only runs up to --baseline-max sites.
+
+Sites are drawn over a synthetic France-sized boundary, and the population
+is a grid of cells of --cell-size metres. Where the baseline runs, both
+paths are checked to give the same areas and per-territory totals.
+
+Usage (from projects/french-rugby-voronoi):
+    python benchmarks/bench_territories.py --sizes 100 2000 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import territories
+
+
+def make_boundary(n_vertices=10_000, seed=42):
+    """Jagged, France-sized polygon in Web Mercator."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 500_000 * (1 + 0.15 * rng.random(n_vertices))
+    return shapely.Polygon(np.column_stack([300_000 + radius * np.cos(angles),
+                                            5_900_000 + radius * np.sin(angles)]))
+
+
+def make_sites(n_sites, boundary, seed=42):
+    """`n_sites` distinct random sites inside `boundary`."""
+    rng = np.random.default_rng(seed)
+    x_min, y_min, x_max, y_max = boundary.bounds
+    xy = rng.uniform([x_min, y_min], [x_max, y_max], (4 * n_sites, 2))
+    xy = xy[shapely.contains_xy(boundary, xy[:, 0], xy[:, 1])]
+    return shapely.points(xy[:n_sites])
+
+
+def make_population(boundary, cell_size, seed=42):
+    """Population grid over the bounding box of `boundary`, top row north."""
+    rng = np.random.default_rng(seed)
+    x_min, y_min, x_max, y_max = boundary.bounds
+    shape = (int(np.ceil((y_max - y_min) / cell_size)), int(np.ceil((x_max - x_min) / cell_size)))
+    return rng.gamma(0.5, 200, shape), x_min, y_max
+
+
+def engine_run(sites, boundary, grid, x_min, y_max, cell_size):
+    """Tessellation, areas and population per territory with the engine."""
+    engine = territories.Territories(sites, boundary)
+    return engine.area_km2, engine.aggregate_grid(grid, x_min, y_max, cell_size)
+
+
+def baseline_run(sites, boundary, grid, x_min, y_max, cell_size):
+    """geovoronoi tessellation, then one grid scan per territory."""
+    from geovoronoi import voronoi_regions_from_coords
+
+    coords = shapely.get_coordinates(sites)
+    region_polys, region_pts = voronoi_regions_from_coords(coords, boundary)
+    rows, cols = np.indices(grid.shape)
+    x = x_min + (cols + 0.5) * cell_size
+    y = y_max - (rows + 0.5) * cell_size
+
+    area, population = np.zeros(len(coords)), np.zeros(len(coords))
+    for region_id, poly in region_polys.items():
+        for site in region_pts[region_id]:
+            area[site] = poly.area / 1e6
+            population[site] = grid[shapely.contains_xy(poly, x, y)].sum()
+    return area, population
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 2_000, 20_000])
+    parser.add_argument('--cell-size', type=float, default=1_000,
+                        help='population grid resolution in metres')
+    parser.add_argument('--baseline-max', type=int, default=2_000,
+                        help='largest number of sites to run the baseline for')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    boundary = make_boundary()
+    grid, x_min, y_max = make_population(boundary, args.cell_size)
+    print(f"Population grid: {grid.shape[0]} x {grid.shape[1]} cells of {args.cell_size:.0f} m")
+    print(f"{'sites':>8} {'baseline (s)':>13} {'engine (s)':>11} {'speed-up':>9}")
+
+    for n_sites in args.sizes:
+        sites = make_sites(n_sites, boundary)
+        inputs = (sites, boundary, grid, x_min, y_max, args.cell_size)
+
+        engine_s, (area, population) = best_time(lambda: engine_run(*inputs), args.repeat)
+        if n_sites > args.baseline_max:
+            print(f"{n_sites:>8,} {'-':>13} {engine_s:>11.3f} {'-':>9}")
+            continue
+
+        baseline_s, (expected_area, expected_population) = best_time(
+            lambda: baseline_run(*inputs), args.repeat)
+        np.testing.assert_allclose(area, expected_area, rtol=1e-9)
+        np.testing.assert_allclose(population, expected_population, rtol=1e-9)
+        print(f"{n_sites:>8,} {baseline_s:>13.3f} {engine_s:>11.3f} {baseline_s / engine_s:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Cached country boundaries for the French rugby Voronoi analysis.
+
+The notebook used to download the 10m Natural Earth countries shapefile on
+every run, read the whole world into memory, and project, clip and dissolve
+France to get the polygon it clips the Voronoi regions with. load_boundary()
+does that once. It keeps the finished polygon (already projected and
+clipped) as a small WKB file under .cache/, keyed on the source URL, the
+country, the clip box and the CRS. Later runs read only that polygon, in
+milliseconds and offline.
+"""
+
+import functools
+import hashlib
+import json
+import os
+
+import shapely
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.cache')
+
+NATURAL_EARTH_URL = 'https://naciscdn.org/naturalearth/10m/cultural/ne_10m_admin_0_countries.zip'
+
+# Mainland France (no overseas territories), in the CRS the box is given in
+MAINLAND_BBOX_3857 = (-600000, 5000000, 1200000, 6650000)
+MAINLAND_BBOX_WGS84 = (-5.5, 41.0, 9.5, 51.5)
+
+# Rough outline used when the boundary cannot be downloaded
+FALLBACK_BBOX_WGS84 = (-5.0, 42.0, 8.0, 51.0)
+
+
+def cache_key(url, country, bbox, crs):
+    """Cache key of one (source, country, clip box, CRS) boundary."""
+    spec = {'url': url, 'country': country, 'bbox': list(bbox), 'crs': str(crs)}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def download_countries(url=NATURAL_EARTH_URL, timeout=30):
+    """Download and read a zipped countries shapefile, once per process."""
+    from io import BytesIO
+    import zipfile
+
+    import geopandas as gpd
+    import requests
+
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    with zipfile.ZipFile(BytesIO(response.content)) as z:
+        return gpd.read_file(z)
+
+
+def build_boundary(url, country, bbox, crs):
+    """Project, clip and dissolve `country` from the shapefile at `url`."""
+    world = download_countries(url)
+    shapes = world[world.ADMIN == country].to_crs(crs)
+    return shapes.clip_by_rect(*bbox).union_all()
+
+
+def load_boundary(country='France', bbox=MAINLAND_BBOX_3857, crs='EPSG:3857',
+                  url=NATURAL_EARTH_URL, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Return the clipped boundary of `country` in `crs` as a shapely geometry.
+
+    `bbox` is (xmin, ymin, xmax, ymax) in `crs`. The first call downloads
+    and builds the boundary; later calls read it from the WKB cache.
+    """
+    cache_path = os.path.join(cache_dir, f'boundary-{cache_key(url, country, bbox, crs)}.wkb')
+
+    if not refresh and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return shapely.from_wkb(f.read())
+
+    boundary = build_boundary(url, country, bbox, crs)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so concurrent readers never see a partial cache
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(shapely.to_wkb(boundary))
+    os.replace(tmp_path, cache_path)
+    return boundary
+
+
+def fallback_boundary(crs='EPSG:3857'):
+    """FALLBACK_BBOX_WGS84 as a polygon in `crs`."""
+    import geopandas as gpd
+
+    box = gpd.GeoSeries([shapely.box(*FALLBACK_BBOX_WGS84)], crs='EPSG:4326')
+    return box.to_crs(crs).iloc[0]
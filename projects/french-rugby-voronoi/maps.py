@@ -0,0 +1,249 @@
+"""
+Interactive (folium) and static (matplotlib) maps of the French rugby
+territories.
+
+The notebook used to add one folium.GeoJson layer per territory, each with
+its own style-function closure and its own tooltip and popup HTML, and one
+CircleMarker per team. Every layer repeats its styling and wiring code in
+the page, so the HTML grows quickly with the number of territories.
+territory_map() puts all territories in a single FeatureCollection layer
+and all sites in a second one. The styling is driven by a property of each
+feature, and the tooltips and popups are shared templates over the feature
+properties.
+
+The geometry is kept small too. The territories are simplified as a
+coverage, so neighbouring territories keep a shared edge without gaps or
+overlaps, and the coordinates are quantised to a fixed number of decimals.
+With `zoom_tolerances`, one layer is built per tolerance and the map swaps
+them as the user zooms, showing coarse outlines zoomed out and full detail
+zoomed in. html_size() reports the size of the rendered page so the
+payload can be tracked.
+
+The static figures used to plot each territory as its own one-row
+GeoSeries and each team with its own ax.plot() call, so every feature
+got its own matplotlib collection or line. plot_territories() and
+plot_sites() draw a whole layer in one collection, with the colour of
+each feature looked up from a categorical column. add_basemap() keeps the
+contextily tiles in a persistent cache, so later renders neither wait for
+nor need the network.
+"""
+
+import json
+import os
+
+import numpy as np
+import shapely
+from branca.element import MacroElement
+from jinja2 import Template
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Persistent contextily tile cache (one file per tile, keyed by its URL)
+TILE_CACHE_DIR = os.path.join(HERE, '.cache', 'tiles')
+
+# Decimal places kept in GeoJSON coordinates (1e-5 degrees is about 1 m)
+COORD_PRECISION = 5
+
+
+def simplify_coverage(geometries, tolerance):
+    """
+    Simplify polygons that tile an area without breaking the tiling.
+
+    Shared edges are simplified once, so neighbours stay gap- and
+    overlap-free. Repeated polygons (sites sharing a territory) are
+    simplified once and count as one tile. Falls back to simplifying each
+    polygon separately (topology-preserving) on shapely/GEOS versions
+    without coverage_simplify().
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    if not tolerance:
+        return geometries
+    _, first, inverse = np.unique(shapely.to_wkb(geometries), return_index=True,
+                                  return_inverse=True)
+    tiles = geometries[first]
+    if hasattr(shapely, 'coverage_simplify'):
+        tiles = shapely.coverage_simplify(tiles, tolerance)
+    else:
+        tiles = shapely.simplify(tiles, tolerance, preserve_topology=True)
+    return tiles[inverse.ravel()]
+
+
+def feature_collection(gdf, properties, tolerance=None, precision=COORD_PRECISION):
+    """
+    GeoJSON FeatureCollection of `gdf` in WGS84 with only `properties`.
+
+    `tolerance` is a simplification tolerance in the units of `gdf`'s CRS
+    (metres for Web Mercator), applied before reprojecting; the WGS84
+    coordinates are then snapped to `precision` decimals.
+    """
+    gdf = gdf[list(properties) + [gdf.geometry.name]]
+    if tolerance:
+        gdf = gdf.set_geometry(simplify_coverage(gdf.geometry.values, tolerance), crs=gdf.crs)
+    gdf = gdf.to_crs('EPSG:4326')
+    gdf = gdf.set_geometry(shapely.set_precision(gdf.geometry.values, 10 ** -precision), crs=gdf.crs)
+    return json.loads(gdf.to_json(drop_id=True))
+
+
+class ZoomSwitch(MacroElement):
+    """Show exactly one of several layers, chosen by the map's zoom level."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var levels = [{% for zoom, layer in this.levels %}[{{ zoom }}, {{ layer.get_name() }}]{{ ',' if not loop.last }}{% endfor %}];
+            function update() {
+                var zoom = map.getZoom(), active = levels[0][1];
+                levels.forEach(function(level) { if (zoom >= level[0]) { active = level[1]; } });
+                levels.forEach(function(level) {
+                    if (level[1] === active) { map.addLayer(level[1]); } else { map.removeLayer(level[1]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, levels):
+        super().__init__()
+        self._name = 'ZoomSwitch'
+        self.levels = sorted(levels, key=lambda level: level[0])
+
+
+def territory_map(territories, sites=None, color_column='color', tooltip_fields=(),
+                  tooltip_aliases=None, popup_fields=None, site_fields=(), tolerance=None,
+                  zoom_tolerances=None, precision=COORD_PRECISION, **map_kwargs):
+    """
+    Folium map of `territories` (and optionally `sites`) in two layers.
+
+    `territories` and `sites` are GeoDataFrames in any CRS, with a
+    `color_column` holding each feature's fill colour. `tooltip_fields`
+    (shown on hover, labelled with `tooltip_aliases`), `popup_fields`
+    (shown on click, defaulting to the tooltip fields) and `site_fields`
+    (tooltip and popup of the sites) name the columns carried into the
+    page. `tolerance` simplifies the territories, in the units of their
+    CRS; `zoom_tolerances` maps minimum zoom levels to tolerances and
+    builds one switchable layer per entry instead. Other keyword arguments
+    go to folium.Map.
+    """
+    import folium
+
+    tooltip_fields = list(tooltip_fields)
+    popup_fields = tooltip_fields if popup_fields is None else list(popup_fields)
+    properties = list(dict.fromkeys([color_column] + tooltip_fields + popup_fields))
+    m = folium.Map(**map_kwargs)
+
+    def territory_layer(layer_tolerance, name):
+        return folium.GeoJson(
+            feature_collection(territories, properties, layer_tolerance, precision),
+            name=name,
+            style_function=lambda feature: {
+                'fillColor': feature['properties'][color_column],
+                'color': 'black',
+                'weight': 2,
+                'fillOpacity': 0.5,
+                'opacity': 0.8,
+            },
+            highlight_function=lambda feature: {'fillOpacity': 0.8, 'weight': 3, 'color': 'white'},
+            tooltip=folium.GeoJsonTooltip(tooltip_fields, aliases=tooltip_aliases, sticky=True)
+            if tooltip_fields else None,
+            popup=folium.GeoJsonPopup(popup_fields) if popup_fields else None,
+        )
+
+    if zoom_tolerances:
+        levels = [(zoom, territory_layer(level_tolerance, f'Territories (zoom {zoom}+)'))
+                  for zoom, level_tolerance in zoom_tolerances.items()]
+        for _, layer in levels:
+            layer.add_to(m)
+        m.add_child(ZoomSwitch(levels))
+    else:
+        territory_layer(tolerance, 'Territories').add_to(m)
+
+    if sites is not None:
+        site_fields = list(site_fields)
+        folium.GeoJson(
+            feature_collection(sites, list(dict.fromkeys([color_column] + site_fields)),
+                               precision=precision),
+            name='Teams',
+            marker=folium.CircleMarker(radius=10, fill=True),
+            style_function=lambda feature: {
+                'fillColor': feature['properties'][color_column],
+                'color': 'white',
+                'weight': 2.5,
+                'fillOpacity': 0.9,
+            },
+            tooltip=folium.GeoJsonTooltip(site_fields) if site_fields else None,
+            popup=folium.GeoJsonPopup(site_fields) if site_fields else None,
+        ).add_to(m)
+    return m
+
+
+def html_size(m):
+    """Size in bytes of the standalone HTML page of folium map `m`."""
+    return len(m.get_root().render().encode('utf-8'))
+
+
+def feature_colors(gdf, column, colors, default='gray'):
+    """Colour of every row of `gdf` from the category in `column`."""
+    return gdf[column].map(colors).fillna(default).to_numpy()
+
+
+def plot_territories(territories, ax, column=None, colors=None, color=None, **kwargs):
+    """
+    Draw all `territories` in one call, as a single PatchCollection.
+
+    The face colour comes from `colors`, a mapping of the values of
+    `column` to colours, or else is `color` for all of them. Other keyword
+    arguments go to GeoDataFrame.plot().
+    """
+    if column is not None:
+        color = feature_colors(territories, column, colors)
+    return territories.plot(ax=ax, color=color, **kwargs)
+
+
+def plot_sites(sites, ax, column=None, colors=None, color='white', markersize=10, **kwargs):
+    """
+    Draw all `sites` in one scatter call.
+
+    Colours work as in plot_territories(). `markersize` is the marker
+    diameter in points, as for ax.plot(); other keyword arguments (e.g.
+    edgecolors, linewidths, zorder) go to ax.scatter().
+    """
+    if column is not None:
+        color = feature_colors(sites, column, colors)
+    xy = shapely.get_coordinates(sites.geometry.values)
+    return ax.scatter(xy[:, 0], xy[:, 1], s=markersize ** 2, c=color, **kwargs)
+
+
+def label_sites(sites, ax, column='Team', **kwargs):
+    """Annotate every site with its value of `column`; keyword arguments go to ax.annotate()."""
+    xy = shapely.get_coordinates(sites.geometry.values)
+    for label, x, y in zip(sites[column], xy[:, 0], xy[:, 1]):
+        ax.annotate(label, (x, y), **kwargs)
+
+
+def add_basemap(ax, crs, source=None, cache_dir=TILE_CACHE_DIR, **kwargs):
+    """
+    Draw web map tiles under the contents of `ax`, whose data is in `crs`.
+
+    Tiles are kept in `cache_dir`, so rendering the same extent again is
+    read from disk and works offline. `source` defaults to CartoDB
+    Positron; other keyword arguments go to contextily.add_basemap().
+    Returns False, leaving `ax` as it was, when the tiles are neither
+    cached nor reachable.
+    """
+    import contextily as cx
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cx.set_cache_dir(cache_dir)
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+    try:
+        cx.add_basemap(ax, crs=crs, source=source or cx.providers.CartoDB.Positron, **kwargs)
+    except Exception as e:
+        print(f"Basemap skipped (tiles unavailable): {e}")
+        return False
+    finally:
+        # add_basemap() may widen the view to whole tiles
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+    return True
@@ -0,0 +1,288 @@
+"""
+Team sites and territories for the French rugby Voronoi analysis.
+
+Preparing the Voronoi seeds used to mean building one shapely Point per team
+in a list comprehension, then looping over the rows to test each point
+against the boundary and snap coastal stadiums onto it with
+nearest_points(). site_points() and snap_inside() do the same with shapely
+2 array operations: one containment test of all sites against the prepared
+boundary, then one R-tree query for the nearest boundary edge of the sites
+outside it. The cost grows linearly with the number of sites, so the same
+code serves the 30 professional teams or thousands of amateur clubs.
+
+Territories builds on them: it computes the clipped Voronoi tessellation
+of the sites once, indexes it, and sums point or raster attributes (e.g.
+the population a club reaches) over every territory in a few vectorised
+calls.
+"""
+
+import numpy as np
+import shapely
+
+# CRS the Voronoi tessellation is computed in
+PROJECTED_CRS = 'EPSG:3857'
+
+
+def site_points(lon, lat, crs=PROJECTED_CRS):
+    """
+    GeoSeries of points for the given longitudes and latitudes, in `crs`.
+
+    The coordinates are WGS84 degrees; the points are built and
+    reprojected in one call each instead of one Point per site.
+    """
+    import geopandas as gpd
+
+    points = gpd.GeoSeries(gpd.points_from_xy(lon, lat), crs='EPSG:4326')
+    return points.to_crs(crs) if crs is not None else points
+
+
+def project_lonlat(lon, lat, crs=PROJECTED_CRS):
+    """Project WGS84 longitude and latitude arrays to x and y arrays in `crs`."""
+    from pyproj import Transformer
+
+    transformer = Transformer.from_crs('EPSG:4326', crs, always_xy=True)
+    return transformer.transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+
+def boundary_segments(boundary):
+    """Start and end coordinates of every edge of `boundary`'s rings."""
+    coords, ring = shapely.get_coordinates(shapely.get_parts(shapely.boundary(boundary)),
+                                           return_index=True)
+    # Consecutive vertices of the same ring form an edge
+    same_ring = ring[:-1] == ring[1:]
+    return coords[:-1][same_ring], coords[1:][same_ring]
+
+
+def snap_inside(points, boundary):
+    """
+    Move every point that is not inside `boundary` to the nearest point on it.
+
+    `points` is an array or GeoSeries of shapely points. Points inside
+    (strictly within) the boundary are returned unchanged; the others are
+    replaced by the point of `boundary` closest to them, as
+    nearest_points(boundary, point)[0] would give. Returns a new array.
+    """
+    points = np.array(points, dtype=object)
+    if len(points) == 0:
+        return points
+
+    # Preparing builds the boundary's spatial index once for all the tests
+    shapely.prepare(boundary)
+    xy = shapely.get_coordinates(points)
+    outside = ~shapely.contains_xy(boundary, xy[:, 0], xy[:, 1])
+    if outside.any():
+        xy = xy[outside]
+        # Nearest boundary edge of every outside point from an R-tree of the
+        # edges, then the closest point on that edge
+        start, end = boundary_segments(boundary)
+        tree = shapely.STRtree(shapely.linestrings(np.stack([start, end], axis=1)))
+        edge = tree.query_nearest(shapely.points(xy), all_matches=False)[1]
+        a, ab = start[edge], end[edge] - start[edge]
+        # A repeated vertex gives a zero-length edge, whose closest point is
+        # its start rather than the NaN of 0 / 0
+        dot, len2 = np.einsum('ij,ij->i', xy - a, ab), np.einsum('ij,ij->i', ab, ab)
+        t = np.clip(np.divide(dot, len2, out=np.zeros_like(dot), where=len2 > 0), 0, 1)
+        points[outside] = shapely.points(a + t[:, None] * ab)
+    return points
+
+
+class TerritoryLookup:
+    """
+    Nearest-site lookup for assigning locations to Voronoi territories.
+
+    A location belongs to the Voronoi territory of its nearest site, so
+    assigning millions of locations needs no polygon test: a cKDTree over
+    the projected sites answers them directly. The boundary is only
+    consulted to reject locations outside it, and even then only for
+    locations in the cells of a coarse grid that the boundary line
+    crosses; grid cells wholly inside or outside it are decided without a
+    geometry test.
+    """
+
+    def __init__(self, points, boundary=None, crs=PROJECTED_CRS, grid_size=256):
+        from scipy.spatial import cKDTree
+
+        self.crs = crs
+        self.sites = shapely.get_coordinates(np.asarray(points, dtype=object))
+        self.tree = cKDTree(self.sites)
+        self.boundary = boundary
+        if boundary is not None:
+            shapely.prepare(boundary)
+            x_min, y_min, x_max, y_max = boundary.bounds
+            self._bounds = (x_min, y_min, x_max, y_max)
+            self._cell = ((x_max - x_min) / grid_size, (y_max - y_min) / grid_size)
+            ix, iy = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing='ij')
+            boxes = shapely.box(x_min + ix * self._cell[0], y_min + iy * self._cell[1],
+                                x_min + (ix + 1) * self._cell[0], y_min + (iy + 1) * self._cell[1])
+            # 1: wholly inside, 0: wholly outside, -1: crossed by the boundary line
+            self._grid = np.where(shapely.contains(boundary, boxes), 1,
+                                  np.where(shapely.intersects(boundary, boxes), -1, 0)).astype(np.int8)
+
+    def inside(self, x, y):
+        """Whether each projected (x, y) point lies in the boundary (or on it)."""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if self.boundary is None:
+            return np.ones(len(x), dtype=bool)
+        x_min, y_min, x_max, y_max = self._bounds
+        in_box = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        grid_size = len(self._grid)
+        ix = np.minimum(((x[in_box] - x_min) / self._cell[0]).astype(np.intp), grid_size - 1)
+        iy = np.minimum(((y[in_box] - y_min) / self._cell[1]).astype(np.intp), grid_size - 1)
+        state = self._grid[ix, iy]
+
+        # Exact test only where the grid cannot decide
+        undecided = state == -1
+        box_idx = np.flatnonzero(in_box)
+        exact = shapely.intersects_xy(self.boundary, x[box_idx[undecided]], y[box_idx[undecided]])
+        result = np.zeros(len(x), dtype=bool)
+        result[box_idx[state == 1]] = True
+        result[box_idx[undecided]] = exact
+        return result
+
+    def locate(self, x, y, n_jobs=1, chunk_size=1_000_000):
+        """
+        Index of the nearest site of each projected (x, y) point.
+
+        Points outside the boundary get -1. The points are processed in
+        chunks of `chunk_size` to bound the temporary memory; with `n_jobs`
+        > 1 the chunks run on that many threads (the KD-tree and shapely
+        calls release the GIL), and -1 uses every CPU.
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        located = np.empty(len(x), dtype=np.intp)
+
+        def run(start):
+            stop = start + chunk_size
+            cx, cy = x[start:stop], y[start:stop]
+            nearest = self.tree.query(np.column_stack([cx, cy]))[1]
+            located[start:stop] = np.where(self.inside(cx, cy), nearest, -1)
+
+        starts = range(0, len(x), chunk_size)
+        if n_jobs == 1 or len(starts) <= 1:
+            for start in starts:
+                run(start)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=None if n_jobs == -1 else n_jobs) as pool:
+                list(pool.map(run, starts))
+        return located
+
+    def assign_territory(self, lon, lat, n_jobs=1, chunk_size=1_000_000):
+        """
+        Index of the site whose territory contains each WGS84 location.
+
+        Projects the longitudes and latitudes to the lookup's CRS and calls
+        locate(); locations outside the boundary get -1.
+        """
+        x, y = project_lonlat(lon, lat, self.crs)
+        return self.locate(x, y, n_jobs=n_jobs, chunk_size=chunk_size)
+
+
+class Territories:
+    """
+    Voronoi territories of a set of sites, clipped to a boundary.
+
+    The tessellation, the clipping, the STRtree of the territories (`tree`)
+    and the TerritoryLookup of the sites (`lookup`) are computed once when
+    the object is built. Territory `i` belongs to site `i`; sites that
+    share coordinates share a territory. Attributes
+    are aggregated per territory with aggregate_points() (point data such
+    as addresses or ticket holders) and aggregate_grid() (raster data such
+    as a population grid).
+    """
+
+    def __init__(self, points, boundary, crs=PROJECTED_CRS):
+        self.crs = crs
+        self.boundary = boundary
+        self.sites = shapely.get_coordinates(np.asarray(points, dtype=object))
+        unique_xy, self.site_region = np.unique(self.sites, axis=0, return_inverse=True)
+        self.site_region = self.site_region.ravel()
+
+        # One Voronoi cell per distinct site, extended over the whole boundary
+        cells = shapely.get_parts(shapely.voronoi_polygons(
+            shapely.multipoints(unique_xy), extend_to=boundary))
+        # voronoi_polygons() does not keep the input order: match each cell
+        # to the site it contains
+        site, cell = shapely.STRtree(cells).query(shapely.points(unique_xy), predicate='within')
+        order = np.empty(len(unique_xy), dtype=np.intp)
+        order[site] = cell
+
+        # Only the cells that cross the boundary need the (costly) overlay
+        shapely.prepare(boundary)
+        self.regions = cells[order]
+        crossing = ~shapely.contains(boundary, self.regions)
+        self.regions[crossing] = shapely.intersection(self.regions[crossing], boundary)
+
+        # Spatial index of the territories, for geometry queries
+        self.tree = shapely.STRtree(self.regions)
+        # A point of the boundary lies in the territory of its nearest
+        # site, so locating points only needs a KD-tree of the sites
+        self.lookup = TerritoryLookup(shapely.points(unique_xy), boundary, crs)
+
+    def __len__(self):
+        return len(self.sites)
+
+    @property
+    def polygons(self):
+        """Clipped territory of every site."""
+        return self.regions[self.site_region]
+
+    @property
+    def area_km2(self):
+        """Area of every site's territory in km² (for a metric CRS)."""
+        return shapely.area(self.polygons) / 1e6
+
+    def locate(self, x, y, **kwargs):
+        """
+        Index of the site whose territory contains each (x, y) point.
+
+        Points outside the boundary get -1. A point on the edge between two
+        territories goes to one of them. Keyword arguments are passed to
+        TerritoryLookup.locate().
+        """
+        located = self.lookup.locate(x, y, **kwargs)
+        # Sites sharing a territory report the first of them
+        first_site = np.full(len(self.regions), -1, dtype=np.intp)
+        first_site[self.site_region[::-1]] = np.arange(len(self))[::-1]
+        return np.where(located >= 0, first_site[np.maximum(located, 0)], -1)
+
+    def assign_territory(self, lon, lat, **kwargs):
+        """Index of the site whose territory contains each WGS84 location (-1 outside)."""
+        return self.locate(*project_lonlat(lon, lat, self.crs), **kwargs)
+
+    def aggregate_points(self, x, y, values=None):
+        """
+        Sum of `values` (1 per point by default) over each site's territory.
+
+        Points outside the boundary are left out. Sites sharing a territory
+        each report its full total.
+        """
+        located = self.locate(x, y)
+        inside = located >= 0
+        weights = None if values is None else np.asarray(values, dtype=float)[inside]
+        region = self.site_region[located[inside]]
+        totals = np.bincount(region, weights=weights, minlength=len(self.regions))
+        return totals[self.site_region]
+
+    def aggregate_grid(self, values, x_min, y_max, cell_size):
+        """
+        Sum of a raster over each site's territory, cell by cell centre.
+
+        `values` is a 2-D array whose first row is the northernmost, with
+        its top-left corner at (x_min, y_max) and square cells of
+        `cell_size` in the territories' CRS. Empty and NaN cells are
+        skipped.
+        """
+        values = np.asarray(values, dtype=float)
+        rows, cols = np.nonzero(np.nan_to_num(values))
+        x = x_min + (cols + 0.5) * cell_size
+        y = y_max - (rows + 0.5) * cell_size
+        return self.aggregate_points(x, y, values[rows, cols])
+
+    def to_geodataframe(self, data=None):
+        """GeoDataFrame of the territories, with the columns of `data` (one row per site)."""
+        import geopandas as gpd
+
+        frame = {} if data is None else {col: np.asarray(data[col]) for col in data.columns}
+        return gpd.GeoDataFrame(frame, geometry=self.polygons, crs=self.crs)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark loading the model features from the column store against
+re-parsing the CSV.
+
+A consumer used to get its features by running pd.read_csv() on the raw
+CSV and engineer_features() on the result, parsing the Name, Ticket and
+Cabin strings only to drop them again. With the column store it opens
+just the feature and target columns as memory maps. The Titanic CSV is
+replicated to each size and both paths build the same float feature
+matrix. Each load runs in a fresh interpreter so that its peak RSS can be
+measured (Linux only). The best-of-N wall time, the growth of peak RSS
+over the interpreter's resident size before loading and the on-disk size
+are reported.
+
+Usage (from projects/titanic):
+    python benchmarks/bench_columnar.py --sizes 1 1000 10000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline
+
+
+def make_inputs(factor, out_dir):
+    """Write the CSV replicated `factor` times and its column store."""
+    raw = pipeline.load_raw()
+    raw = pd.concat([raw] * factor, ignore_index=True)
+    csv_path = os.path.join(out_dir, f'titanic-x{factor}.csv')
+    raw.to_csv(csv_path, index=False)
+
+    data = pipeline.engineer_features(raw)
+    store_path = os.path.join(out_dir, f'features-x{factor}')
+    pipeline.write_columns(data, store_path, meta={'feature_cols': pipeline.feature_columns(data)})
+    return csv_path, store_path
+
+
+def load_csv(csv_path):
+    """Features and target the old way: parse the CSV and re-engineer."""
+    data = pipeline.engineer_features(pd.read_csv(csv_path))
+    cols = pipeline.feature_columns(data)
+    return data[cols].to_numpy(dtype=np.float64), data['Survived'].to_numpy()
+
+
+def load_store(store_path):
+    """Features and target from the memory-mapped column store."""
+    schema = pipeline.read_schema(store_path)
+    cols = schema['feature_cols']
+    data = pipeline.read_columns(store_path, cols + ['Survived'], schema=schema)
+    return data[cols].to_numpy(dtype=np.float64), data['Survived'].to_numpy()
+
+
+def memory_kb(field):
+    """`field` (e.g. VmRSS, VmHWM) of this process from /proc, in kB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def worker(kind, path, repeat):
+    """Run one load path in this process and print its timings as JSON."""
+    # Reset the peak RSS so the spike of importing pandas is not counted
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    base_kb = memory_kb('VmRSS')
+    load = load_csv if kind == 'csv' else load_store
+    best_s, (X, y) = best_time(lambda: load(path), repeat)
+    print(json.dumps({
+        'seconds': best_s,
+        'rss_mb': (memory_kb('VmHWM') - base_kb) / 1024,
+        'checksum': [float(X.sum()), int(y.sum()), list(X.shape)],
+    }))
+
+
+def measure(kind, path, repeat):
+    """Run worker() in a fresh interpreter and return its JSON result."""
+    out = subprocess.run([sys.executable, __file__, '--worker', kind, path, '--repeat', str(repeat)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def disk_mb(path):
+    """Size of a file or directory in MB."""
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 10000],
+                        help='replication factors of the 891-row dataset')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--worker', nargs=2, metavar=('KIND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker, args.repeat)
+        return
+
+    print(f"{'rows':>12} {'csv (s)':>9} {'store (s)':>10} {'speed-up':>9} "
+          f"{'csv RSS':>9} {'store RSS':>10} {'csv MB':>8} {'store MB':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in args.sizes:
+            csv_path, store_path = make_inputs(factor, tmp)
+            csv = measure('csv', csv_path, args.repeat)
+            store = measure('store', store_path, args.repeat)
+            if csv['checksum'][1:] != store['checksum'][1:] or not np.isclose(
+                    csv['checksum'][0], store['checksum'][0], rtol=1e-9):
+                raise AssertionError(f"feature matrices differ: {csv['checksum']} != {store['checksum']}")
+
+            n_rows = store['checksum'][2][0]
+            print(f"{n_rows:>12,} {csv['seconds']:>9.3f} {store['seconds']:>10.3f} "
+                  f"{csv['seconds'] / store['seconds']:>8.1f}x "
+                  f"{csv['rss_mb']:>7.0f}MB {store['rss_mb']:>8.0f}MB "
+                  f"{disk_mb(csv_path):>8.1f} {disk_mb(store_path):>9.1f}")
+            os.remove(csv_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the one-sweep curve kernel against the separate scikit-learn calls
+used for the ROC and precision-recall figures.
+
+For every model the figures used to call roc_curve(), auc(),
+precision_recall_curve(), auc() again and roc_auc_score(), each of which
+sorts the scores. curves.sweep() sorts each model's scores once, for all
+models in one batched call. Synthetic holdouts with ties in the scores are
+generated at each size; both paths are checked to agree and the best-of-N
+wall time is reported.
+
+Usage (from projects/titanic):
+    python benchmarks/bench_curves.py --sizes 100000 1000000 5000000 --models 24
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import auc, precision_recall_curve, roc_auc_score, roc_curve
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import curves
+
+
+def make_holdout(n_rows, n_models, seed=42):
+    """Labels and rounded (hence tied) scores for `n_models` models."""
+    rng = np.random.default_rng(seed)
+    y_true = rng.random(n_rows) < 0.38
+    skill = rng.uniform(0.1, 0.6, (n_models, 1))
+    scores = np.clip(rng.random((n_models, n_rows)) * (1 - skill) + y_true * skill, 0, 1)
+    return y_true, scores.round(4)
+
+
+def sklearn_curves(y_true, scores):
+    """ROC AUC and PR AUC per model, the way the figures computed them."""
+    roc_aucs, pr_aucs = [], []
+    for row in scores:
+        fpr, tpr, _ = roc_curve(y_true, row)
+        roc_aucs.append(auc(fpr, tpr))
+        precision, recall, _ = precision_recall_curve(y_true, row)
+        pr_aucs.append(auc(recall, precision))
+        roc_auc_score(y_true, row)
+    return np.array(roc_aucs), np.array(pr_aucs)
+
+
+def kernel_curves(y_true, scores):
+    """ROC AUC and PR AUC per model from a single batched sweep."""
+    sweep = curves.sweep(y_true, scores)
+    return sweep.roc_auc, sweep.pr_auc
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--models', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"ROC/PR curves and AUCs for {args.models} models")
+    print(f"{'rows':>12} {'sklearn (s)':>12} {'sweep (s)':>10} {'speed-up':>9}")
+
+    for n_rows in args.sizes:
+        y_true, scores = make_holdout(n_rows, args.models)
+
+        sklearn_s, expected = best_time(lambda: sklearn_curves(y_true, scores), args.repeat)
+        kernel_s, result = best_time(lambda: kernel_curves(y_true, scores), args.repeat)
+        for got, want in zip(result, expected):
+            np.testing.assert_allclose(got, want, rtol=0, atol=1e-12)
+
+        print(f"{n_rows:>12,} {sklearn_s:>12.3f} {kernel_s:>10.3f} {sklearn_s / kernel_s:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Titanic pipeline, models and figures.
+
+The other scripts in this directory each time one optimisation against the
+code it replaced. This suite instead times the code paths as they are now,
+on synthetic passenger tables of growing size (see synthetic.py), so
+regressions and scaling problems show up from one commit to the next. The
+cases are:
+
+  - the pipeline steps: title extraction, group imputation of Age, one-hot
+    encoding, and engineer_features() end to end,
+  - the out-of-core cleaning of streaming.py, from CSV to CSV,
+  - fitting every model family of 03_modeling (XGBoost when installed),
+  - scoring the models on the test set (scoring.score_models()),
+  - drawing and saving each figure of generate_visualizations.py and
+    generate_model_visualizations.py, with the synthetic table swapped in
+    for the real one.
+
+Models that are not the subject of a case (the ones scored, or drawn in the
+model figures) are fitted on FIT_ROWS training rows, outside the timing.
+Some cases do not scale to the largest sizes (an SVM is quadratic in the
+rows), so each has a row limit above which it is skipped; --no-limits
+lifts them. Memory grows with the table too: about 1 GB at a million
+rows, so 10^7 rows need a machine with 10 GB or more.
+
+Every run is appended to benchmarks/history.jsonl with the git commit,
+library versions and machine. --compare prints each time next to the same
+case in an earlier run: the previous run by default, or the latest run at
+a given commit.
+
+Usage (from projects/titanic):
+    python benchmarks/suite.py --sizes 1000 100000 10000000
+    python benchmarks/suite.py --cases 'fit:*' --compare 3c20752
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import figures
+import generate_model_visualizations
+import generate_visualizations
+import model_registry
+import pipeline
+import profiling
+import scoring
+import streaming
+import synthetic
+
+HISTORY_PATH = os.path.join(BENCH_DIR, 'history.jsonl')
+
+# Training rows for the models that are only inputs to a case
+FIT_ROWS = 10_000
+# Rows above which a case is skipped unless --no-limits is given
+FIT_LIMITS = {
+    'Logistic Regression': 1_000_000,
+    'Decision Tree': 1_000_000,
+    'Random Forest': 100_000,
+    'SVM': 10_000,
+    'XGBoost': 1_000_000,
+}
+FIGURE_LIMIT = 1_000_000
+
+Case = namedtuple('Case', ['setup', 'max_rows'])
+CASES = {}
+
+
+def case(name, max_rows=None):
+    """
+    Decorator registering `setup` as the benchmark case `name`.
+
+    setup(workload, stack) prepares the inputs (untimed) and returns the
+    callable to time. Anything it patches or opens is entered on the
+    contextlib.ExitStack `stack`, which is closed after the timing.
+    """
+    def decorator(setup):
+        CASES[name] = Case(setup, max_rows)
+        return setup
+    return decorator
+
+
+class Workload:
+    """Synthetic inputs of one size, built on first use and shared by the cases."""
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+
+    @functools.cached_property
+    def raw(self):
+        return synthetic.make_passengers(self.n_rows)
+
+    @functools.cached_property
+    def features(self):
+        """Engineered frame, feature columns, split and folds, as load_features() returns them."""
+        data = pipeline.engineer_features(self.raw)
+        train_idx, test_idx = pipeline.split_indices(data['Survived'])
+        return {
+            'data': data,
+            'feature_cols': pipeline.feature_columns(data),
+            'train_idx': train_idx,
+            'test_idx': test_idx,
+            'fold_ids': pipeline.fold_ids(data['Survived'].iloc[train_idx]),
+        }
+
+    @functools.cached_property
+    def split(self):
+        """X_train, X_test, y_train, y_test plus the standardised X_train and X_test."""
+        from sklearn.preprocessing import StandardScaler
+
+        X_train, X_test, y_train, y_test = pipeline.split_frames(self.features)
+        scaler = StandardScaler().fit(X_train)
+        return X_train, X_test, y_train, y_test, scaler.transform(X_train), scaler.transform(X_test)
+
+    @functools.cached_property
+    def model_split(self):
+        """The tuple generate_model_visualizations.load_split() returns, on FIT_ROWS training rows."""
+        X_train, X_test, y_train, y_test = pipeline.split_frames(self.features)
+        fit = slice(0, FIT_ROWS)
+        X = self.features['data'][self.features['feature_cols']]
+        return X, X_train.iloc[fit], X_test, y_train.iloc[fit], y_test
+
+
+def model_families():
+    """Unfitted model of every family in 03_modeling, and whether it takes scaled inputs."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    params = generate_model_visualizations.MODEL_PARAMS
+    families = {
+        'Logistic Regression': (LogisticRegression(**params['Logistic Regression']), True),
+        'Decision Tree': (DecisionTreeClassifier(**params['Decision Tree']), False),
+        'Random Forest': (RandomForestClassifier(**params['Random Forest']), False),
+        'SVM': (SVC(probability=True, random_state=42), True),
+    }
+    try:
+        import xgboost as xgb
+        families['XGBoost'] = (xgb.XGBClassifier(random_state=42, eval_metric='logloss'), False)
+    except ImportError:
+        pass
+    return families
+
+
+def slug(name):
+    return name.lower().replace(' ', '_')
+
+
+# Pipeline steps
+
+@case('title_extraction')
+def title_extraction(workload, stack):
+    names = workload.raw['Name']
+    return lambda: pipeline.extract_title(names)
+
+
+@case('group_imputation')
+def group_imputation(workload, stack):
+    data = workload.raw[['Age', 'Pclass']].copy()
+    data['Title'] = pipeline.extract_title(workload.raw['Name'])
+    return lambda: pipeline.fill_group_median(data, 'Age', ['Pclass', 'Title'])
+
+
+@case('one_hot_encoding')
+def one_hot_encoding(workload, stack):
+    data = workload.features['data']
+    # The engineered frame as it is just before encoding
+    encoded = tuple(f'{prefix}_' for prefix in ('Embarked', 'Title', 'AgeGroup'))
+    data = data[[col for col in data.columns if not col.startswith(encoded)]].copy()
+    data['Sex'] = workload.raw['Sex']
+    return lambda: pipeline.encode_categoricals(data)
+
+
+@case('engineer_features')
+def engineer_features(workload, stack):
+    raw = workload.raw
+    return lambda: pipeline.engineer_features(raw)
+
+
+@case('streaming_clean')
+def streaming_clean(workload, stack):
+    tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+    path = os.path.join(tmp_dir, 'raw.csv')
+    workload.raw.to_csv(path, index=False)
+    output_path = os.path.join(tmp_dir, 'clean.csv')
+    return lambda: streaming.clean_csv(path, output_path, verbose=False)
+
+
+# Models
+
+def fit_case(name, workload, stack):
+    from sklearn.base import clone
+
+    model, scaled = model_families()[name]
+    X_train, _, y_train, _, X_train_scaled, _ = workload.split
+    X = X_train_scaled if scaled else X_train
+    return lambda: clone(model).fit(X, y_train)
+
+
+for _name in ('Logistic Regression', 'Decision Tree', 'Random Forest', 'SVM', 'XGBoost'):
+    case(f'fit:{slug(_name)}', FIT_LIMITS[_name])(functools.partial(fit_case, _name))
+
+
+@case('score_models')
+def score_models(workload, stack):
+    X_train, X_test, y_train, y_test, X_train_scaled, X_test_scaled = workload.split
+    fit = slice(0, FIT_ROWS)
+    models, inputs = {}, {}
+    for name, (model, scaled) in model_families().items():
+        X_fit = X_train_scaled[fit] if scaled else X_train.iloc[fit]
+        models[name] = model.fit(X_fit, y_train.iloc[fit])
+        if scaled:
+            inputs[name] = X_test_scaled
+    return lambda: scoring.score_models(models, X_test, y_test, inputs=inputs)
+
+
+# Figures
+
+def figure_case(module, filename, workload, stack):
+    """Render one figure of `module` from the workload's synthetic data."""
+    if module is generate_visualizations:
+        stack.enter_context(mock.patch.object(module, 'raw_data', lambda: workload.raw))
+        # The profile figures would otherwise read the real CSV at every size
+        stack.enter_context(mock.patch.object(module, 'dataset_profile',
+                                              lambda: profiling.profile(workload.raw)))
+        stack.enter_context(mock.patch.object(pipeline, 'load_features',
+                                              lambda *args, **kwargs: workload.features))
+    else:
+        # Drop the models loaded before and after the case
+        for cached in (module.models_dir, module.trained_models, module.model_scores,
+                       model_registry.load_registry):
+            cached.cache_clear()
+            stack.callback(cached.cache_clear)
+        stack.enter_context(mock.patch.object(module, 'load_split', lambda: workload.model_split))
+        # The models and scores go to a temporary directory: the real cache is
+        # keyed on the real data and must neither be read nor written here
+        models_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(mock.patch.object(module, 'models_dir', lambda: models_dir))
+        # Train and score once, untimed
+        module.model_scores()
+
+    task = module.FIGURES.tasks[filename]
+    path = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), filename)
+    return lambda: figures.render(task.func, path, module.FIGURES.setup)
+
+
+for _module in (generate_visualizations, generate_model_visualizations):
+    for _filename, _ in _module.FIGURES:
+        case(f'figure:{_filename}', FIGURE_LIMIT)(functools.partial(figure_case, _module, _filename))
+
+
+def best_time(func, repeat):
+    """Best wall time over `repeat` runs, plus the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def git_state():
+    """Current commit (None outside a git checkout) and whether the tree has changes."""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    try:
+        return git('rev-parse', 'HEAD'), bool(git('status', '--porcelain', '--untracked-files=no'))
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def environment():
+    """Library versions and machine description recorded with each run."""
+    import matplotlib
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'matplotlib': matplotlib.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def load_history(path=HISTORY_PATH):
+    """Earlier runs, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def reference_run(history, commit=None):
+    """Latest run in `history` at `commit` (a prefix), or the latest run at all."""
+    for run in reversed(history):
+        if commit is None or (run['commit'] or '').startswith(commit):
+            return run
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--cases', nargs='+', default=['*'],
+                        help='glob patterns of the cases to run (e.g. "fit:*" "figure:*")')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-limits', action='store_true',
+                        help='run every case at every size, ignoring the row limits')
+    parser.add_argument('--compare', nargs='?', const='', default=None, metavar='COMMIT',
+                        help='compare with the latest run at COMMIT (default: the previous run)')
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--no-save', action='store_true', help='do not append this run to the history')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    args = parser.parse_args()
+
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    if 'fit:xgboost' in names and 'XGBoost' not in model_families():
+        names.remove('fit:xgboost')
+    if args.list:
+        print('\n'.join(names))
+        return
+
+    reference = None
+    if args.compare is not None:
+        reference = reference_run(load_history(args.history), args.compare or None)
+        if reference is None:
+            parser.error(f"no run in {args.history} to compare with")
+        print(f"Comparing with the run of {reference['time']} at {(reference['commit'] or '?')[:7]}")
+        reference = {(r['case'], r['rows']): r['seconds'] for r in reference['results']}
+
+    header = f"{'case':<38} {'rows':>12} {'time (s)':>10}"
+    print(header + (f" {'vs ref':>8}" if reference is not None else ''))
+    results = []
+    for n_rows in args.sizes:
+        workload = Workload(n_rows)
+        for name in names:
+            if CASES[name].max_rows is not None and n_rows > CASES[name].max_rows and not args.no_limits:
+                continue
+            with contextlib.ExitStack() as stack:
+                seconds, _ = best_time(CASES[name].setup(workload, stack), args.repeat)
+            results.append({'case': name, 'rows': n_rows, 'seconds': seconds})
+
+            line = f"{name:<38} {n_rows:>12,} {seconds:>10.4f}"
+            if reference is not None:
+                before = reference.get((name, n_rows))
+                line += f" {before / seconds:>7.2f}x" if before else f" {'-':>8}"
+            print(line, flush=True)
+
+    if not args.no_save:
+        commit, dirty = git_state()
+        run = {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'dirty': dirty,
+            'environment': environment(),
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+        print(f"Appended to {os.path.relpath(args.history)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Synthetic Titanic passenger tables of any size, for benchmarking.
+
+The real data has 891 rows, too few to tell how the pipeline, the models
+and the figures scale. make_passengers() draws rows with replacement from
+data/titanic.csv, which keeps the joint distribution of class, sex,
+survival, family, port and cabin, and the pattern of missing values. The
+continuous and text columns are then perturbed so the table is not just
+repeats of 891 rows:
+
+  - Age and Fare get a few percent of multiplicative noise,
+  - every Name gets a surname drawn independently of the row, keeping the
+    row's title and given names (so title extraction sees the real mix),
+  - PassengerId is renumbered from 1.
+
+Usage (from projects/titanic), to write a table as CSV:
+    python benchmarks/synthetic.py 1000000 /tmp/titanic_1m.csv
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline
+
+
+def make_passengers(n_rows, path=pipeline.DATA_PATH, seed=42):
+    """Synthetic passenger table of `n_rows` rows with the statistics of `path`."""
+    rng = np.random.default_rng(seed)
+    real = pipeline.load_raw(path)
+    data = real.iloc[rng.integers(0, len(real), n_rows)].reset_index(drop=True)
+    data['PassengerId'] = np.arange(1, n_rows + 1)
+
+    # NaN stays NaN through the noise, so the missing pattern is kept
+    age = data['Age'].to_numpy() * rng.normal(1, 0.05, n_rows)
+    data['Age'] = np.where(age < 1, np.round(age, 2), np.round(age)).clip(0.17, 80)
+    data['Fare'] = np.round(data['Fare'].to_numpy() * rng.lognormal(0, 0.05, n_rows), 4)
+
+    # "Surname, Title. Given names": swap in a surname from another passenger
+    parts = real['Name'].str.split(', ', n=1, expand=True)
+    surnames = parts[0].to_numpy()
+    rest = data['Name'].str.split(', ', n=1).str[1]
+    names = pd.Series(surnames[rng.integers(0, len(surnames), n_rows)]) + ', ' + rest
+    data['Name'] = names.astype(real['Name'].dtype)
+    return data[real.columns]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output', help='CSV file to write')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    make_passengers(args.rows, seed=args.seed).to_csv(args.output, index=False)
+    print(f"Wrote {args.rows:,} passengers to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+One-sweep ROC / precision-recall kernel for binary classifiers.
+
+roc_curve(), precision_recall_curve(), auc() and roc_auc_score() each sort
+the scores again, so drawing both curves and their AUCs for one model sorts
+it several times. sweep() sorts every score vector once, accumulates the
+true and false positive counts along the sorted order, and derives the ROC
+and PR points, both AUCs and the confusion matrix at any threshold from
+those counts. It takes a 2-D array with one row of scores per model and
+processes all rows in the same vectorised calls.
+
+The points returned by Curves.roc() and Curves.pr() match scikit-learn's
+roc_curve() (with drop_intermediate=True) and precision_recall_curve(), so
+they can be swapped in for plotting.
+"""
+
+import functools
+
+import numpy as np
+
+
+class Curves:
+    """
+    Cumulative true/false positive counts of one or more score vectors.
+
+    Build it with sweep(). Row `i` of every array belongs to the `i`-th
+    score vector, sorted by decreasing score.
+    """
+
+    def __init__(self, y_true, scores):
+        y_true = np.asarray(y_true).astype(bool)
+        scores = np.atleast_2d(np.asarray(scores, dtype=float))
+        if scores.shape[1] != len(y_true):
+            raise ValueError(f"scores have {scores.shape[1]} columns but y_true has "
+                             f"{len(y_true)} labels")
+        n_models, n_samples = scores.shape
+        self.n_pos = int(y_true.sum())
+        self.n_neg = n_samples - self.n_pos
+
+        # The only sort: a stable descending argsort of every row at once
+        order = np.argsort(-scores, axis=1, kind='stable')
+        self.scores = np.take_along_axis(scores, order, axis=1)
+        self.tps = np.cumsum(y_true[order], axis=1)
+        self.fps = np.arange(1, n_samples + 1) - self.tps
+
+        # The last position of each run of tied scores is a distinct threshold
+        self.distinct = np.ones((n_models, n_samples), dtype=bool)
+        self.distinct[:, :-1] = self.scores[:, :-1] != self.scores[:, 1:]
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    @functools.cached_property
+    def _tie_corrected(self):
+        """tps and fps with every position moved to the end of its tie run."""
+        n_samples = self.scores.shape[1]
+        ends = np.where(self.distinct, np.arange(n_samples), n_samples - 1)
+        ends = np.minimum.accumulate(ends[:, ::-1], axis=1)[:, ::-1]
+        return (np.take_along_axis(self.tps, ends, axis=1),
+                np.take_along_axis(self.fps, ends, axis=1))
+
+    @property
+    def roc_auc(self):
+        """Area under the ROC curve of every row."""
+        tps, fps = self._tie_corrected
+        tpr = np.concatenate([np.zeros((len(self), 1)), tps / self.n_pos], axis=1)
+        fpr = np.concatenate([np.zeros((len(self), 1)), fps / self.n_neg], axis=1)
+        return np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]), axis=1) / 2
+
+    @property
+    def pr_auc(self):
+        """Trapezoidal area under the precision-recall curve of every row."""
+        tps, fps = self._tie_corrected
+        precision = np.concatenate([np.ones((len(self), 1)), tps / (tps + fps)], axis=1)
+        recall = np.concatenate([np.zeros((len(self), 1)), tps / self.n_pos], axis=1)
+        return np.sum(np.diff(recall, axis=1) * (precision[:, 1:] + precision[:, :-1]), axis=1) / 2
+
+    def roc(self, row=0):
+        """fpr, tpr and thresholds of row `row`, as returned by roc_curve()."""
+        keep = self.distinct[row]
+        tps, fps, thresholds = self.tps[row][keep], self.fps[row][keep], self.scores[row][keep]
+        if len(tps) > 2:
+            # Drop points on straight segments of the curve
+            corner = np.logical_or(np.diff(fps, 2), np.diff(tps, 2))
+            keep = np.concatenate([[True], corner, [True]])
+            tps, fps, thresholds = tps[keep], fps[keep], thresholds[keep]
+        tps = np.concatenate([[0], tps])
+        fps = np.concatenate([[0], fps])
+        thresholds = np.concatenate([[np.inf], thresholds])
+        return fps / fps[-1], tps / tps[-1], thresholds
+
+    def pr(self, row=0):
+        """precision, recall and thresholds of row `row`, as returned by precision_recall_curve()."""
+        keep = self.distinct[row]
+        tps, fps, thresholds = self.tps[row][keep], self.fps[row][keep], self.scores[row][keep]
+        precision = tps / (tps + fps)
+        recall = tps / tps[-1]
+        return (np.concatenate([precision[::-1], [1.0]]),
+                np.concatenate([recall[::-1], [0.0]]),
+                thresholds[::-1])
+
+    def confusion_matrix(self, threshold=0.5):
+        """
+        Confusion matrices of every row when scores >= `threshold` are positive.
+
+        Returns an array of shape (n_rows, 2, 2) laid out like
+        sklearn.metrics.confusion_matrix: [[tn, fp], [fn, tp]].
+        """
+        # Number of scores >= threshold in each (descending) row
+        counts = np.array([np.searchsorted(-row, -threshold, side='right')
+                           for row in self.scores])
+        tps = np.concatenate([np.zeros((len(self), 1), dtype=self.tps.dtype), self.tps], axis=1)
+        tp = tps[np.arange(len(self)), counts]
+        fp = counts - tp
+        return np.stack([
+            np.stack([self.n_neg - fp, fp], axis=1),
+            np.stack([self.n_pos - tp, tp], axis=1),
+        ], axis=1)
+
+
+def sweep(y_true, scores):
+    """
+    Sort each row of `scores` once and return its Curves.
+
+    `scores` is a 1-D score vector or a 2-D array with one row per model,
+    all scored against the same `y_true`.
+    """
+    return Curves(y_true, scores)
@@ -0,0 +1,164 @@
+"""
+Cached, parallel SHAP explanations of the tree models in 03_modeling.
+
+The notebook used to explain the Random Forest on the first 100 training
+rows only, because TreeExplainer is slow: its cost grows with rows x trees
+x leaves, several milliseconds per row for the tuned forest. shap_values()
+explains every row it is given. The SHAP values of a row do not depend on
+the other rows, so the rows are cut into chunks and a joblib worker pool
+explains the chunks in parallel. The rows reach the workers as a read-only
+memory map (see search.shared_array()), so only the model is pickled per
+chunk.
+
+The positive-class values are stored as a float32 .npy under .cache/shap,
+named after a hash of the model and a hash of the rows, with the expected
+value and the feature names in a JSON sidecar. Re-running with the same
+model and data (re-executing the notebook, or drawing another plot) reads
+the file instead of recomputing. summary_plot() and dependence_plot() draw
+from the returned Explanation, so any number of plots cost one
+explanation.
+"""
+
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import search
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHAP_CACHE_DIR = os.path.join(HERE, '.cache', 'shap')
+
+# `values` is (rows, features) float32 for the positive class, `base_value`
+# the expected model output, `data` the explained rows as a DataFrame
+Explanation = namedtuple('Explanation', ['values', 'base_value', 'data'])
+
+
+def model_hash(model):
+    """Hex digest of a fitted model's pickled state."""
+    import joblib
+
+    return joblib.hash(model)
+
+
+def positive_class(values):
+    """
+    SHAP values of the positive class as a (rows, features) array.
+
+    TreeExplainer returns one matrix for margin models (XGBoost), and a
+    list of per-class matrices (older shap) or a (rows, features, classes)
+    array (newer shap) for probability models (scikit-learn forests).
+    """
+    if isinstance(values, list):
+        values = values[-1]
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[..., -1]
+    return values
+
+
+def explain_chunk(model, X, start, stop):
+    """Positive-class SHAP values of rows [start, stop) of `X`, and the expected value."""
+    import shap
+
+    explainer = shap.TreeExplainer(model)
+    values = positive_class(explainer.shap_values(np.asarray(X[start:stop])))
+    base_value = float(np.atleast_1d(explainer.expected_value)[-1])
+    return values.astype(np.float32), base_value
+
+
+def cache_paths(model_key, data_key, cache_dir=SHAP_CACHE_DIR):
+    """Paths of the values (.npy) and sidecar (.json) of one explanation."""
+    stem = os.path.join(cache_dir, f'{model_key[:16]}-{data_key[:16]}')
+    return stem + '.npy', stem + '.json'
+
+
+def shap_values(model, X, n_jobs=-1, chunk_size=None, cache_dir=SHAP_CACHE_DIR,
+                model_key=None, refresh=False, verbose=True):
+    """
+    Explanation of every row of `X` by tree model `model`, computed once.
+
+    `X` is the DataFrame the model takes. `model_key` identifies the model
+    in the cache (e.g. ModelRegistry.digest()) and defaults to a hash of
+    its pickled state. The values are computed in chunks of `chunk_size`
+    rows (by default one chunk per worker, as every chunk builds its own
+    explainer) over `n_jobs` workers, unless the cache already holds them
+    and `refresh` is false.
+    """
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    model_key = model_key or model_hash(model)
+    values_path, meta_path = cache_paths(model_key, search.array_hash(X), cache_dir)
+    if not refresh and os.path.exists(values_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if verbose:
+            print(f"SHAP values read from cache ({len(X):,} rows)")
+        return Explanation(np.load(values_path, mmap_mode='r'), meta['base_value'], X)
+
+    start = time.time()
+    shared = search.shared_array(X, cache_dir)
+    shared_path = shared.filename
+    chunk_size = chunk_size or max(1, -(-len(X) // effective_n_jobs(n_jobs)))
+    bounds = [(i, min(i + chunk_size, len(X))) for i in range(0, len(X), chunk_size)]
+    try:
+        chunks = Parallel(n_jobs=n_jobs)(
+            delayed(explain_chunk)(model, shared, i, j) for i, j in bounds
+        )
+    finally:
+        # The rows are only needed while explaining. Close the map before
+        # removing its file, which Windows refuses while it is open; if a
+        # worker still holds it, the file is left for the next run to reuse.
+        del shared
+        try:
+            os.remove(shared_path)
+        except OSError:
+            pass
+    values = np.concatenate([chunk for chunk, _ in chunks])
+    base_value = chunks[0][1]
+    seconds = time.time() - start
+
+    tmp_path = f'{values_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, values_path)
+    meta = {
+        'base_value': base_value,
+        'feature_names': list(X.columns),
+        'rows': len(X),
+        'model': type(model).__module__ + '.' + type(model).__qualname__,
+        'seconds': round(seconds, 2),
+    }
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+    if verbose:
+        print(f"SHAP values of {len(X):,} rows computed in {seconds:.1f}s "
+              f"(chunks of {chunk_size:,} rows)")
+    return Explanation(values, base_value, X)
+
+
+def summary_plot(explanation, plot_type=None, max_display=15, **kwargs):
+    """shap.summary_plot() of `explanation` on the current figure."""
+    import shap
+
+    shap.summary_plot(np.asarray(explanation.values), explanation.data, plot_type=plot_type,
+                      max_display=max_display, show=False, **kwargs)
+
+
+def dependence_plot(explanation, feature, interaction_index='auto', ax=None, **kwargs):
+    """shap.dependence_plot() of `feature` in `explanation`."""
+    import shap
+
+    shap.dependence_plot(feature, np.asarray(explanation.values), explanation.data,
+                         interaction_index=interaction_index, ax=ax, show=False, **kwargs)
+
+
+def top_features(explanation, n=3):
+    """The `n` features with the largest mean |SHAP value|."""
+    importance = np.abs(np.asarray(explanation.values)).mean(axis=0)
+    return [explanation.data.columns[i] for i in np.argsort(importance)[::-1][:n]]
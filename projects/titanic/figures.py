@@ -0,0 +1,235 @@
+"""
+Figure-task registry and parallel renderer for the generate_*.py scripts.
+
+Each chart is a module-level function that draws one figure and returns it
+(the figure spec); it is registered against the PNG it produces with
+FigureRegistry.register(). render_all() then saves every registered figure,
+spreading the work across a process pool on the Agg backend. Rendering is
+CPU-bound and independent per figure, so wall time drops roughly with the
+number of workers.
+
+Every figure also declares its inputs: the dataset hash, PIPELINE_VERSION,
+any parameters it is built from (e.g. model hyperparameters) and a hash of
+its plotting code. The inputs of each saved PNG are recorded in
+images/.manifest.json, and figures whose inputs are unchanged are skipped,
+so a no-op build does not load the data, train models or draw anything.
+
+Each figure is drawn once and saved twice: as the PNG and as an SVG next
+to it (vector_path()). build_images.py, at the root of the repository,
+serves the SVG instead of the PNG's WebP variants wherever it is smaller.
+
+Chart functions are sent to the workers by reference, so they must be
+defined at module level and load their inputs lazily (e.g. through a
+functools.lru_cache helper) rather than at import time.
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend
+import matplotlib.pyplot as plt
+
+import pipeline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(HERE, 'images')
+MANIFEST_NAME = '.manifest.json'
+
+SAVEFIG_KWARGS = {'dpi': 150, 'bbox_inches': 'tight'}
+# A fixed salt and no date keep the SVG of an unchanged figure byte-identical
+VECTOR_FORMAT = 'svg'
+VECTOR_RC = {'svg.hashsalt': 'figures'}
+VECTOR_KWARGS = {'bbox_inches': 'tight', 'metadata': {'Date': None}}
+
+FigureTask = namedtuple('FigureTask', ['title', 'func', 'code', 'params'])
+
+
+class FigureRegistry:
+    """
+    Ordered mapping of output filename to the task that draws it.
+
+    `setup` is called in each process before a figure is drawn; use it for
+    the plot style and for importing heavy plotting libraries so that
+    checking the manifest stays cheap.
+    """
+
+    def __init__(self, setup=None):
+        self.tasks = {}
+        self.setup = setup
+
+    def register(self, filename, title=None, code=(), params=None):
+        """
+        Decorator registering `func` as the chart saved to `filename`.
+
+        `code` lists the helper functions whose source also determines the
+        figure, and `params` is a JSON-serialisable description of anything
+        else it is built from, such as model hyperparameters.
+        """
+        def decorator(func):
+            if filename in self.tasks:
+                raise ValueError(f"Figure {filename!r} is already registered")
+            self.tasks[filename] = FigureTask(title or func.__name__, func, tuple(code), params)
+            return func
+        return decorator
+
+    def __iter__(self):
+        return iter(self.tasks.items())
+
+    def __len__(self):
+        return len(self.tasks)
+
+
+def code_hash(objects):
+    """SHA-256 hex digest of the source code of `objects`."""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode())
+    return digest.hexdigest()
+
+
+def figure_inputs(registry, task, dataset_hash):
+    """The recorded inputs of `task`, normalised through JSON."""
+    code = [task.func, *task.code] + ([registry.setup] if registry.setup else [])
+    inputs = {
+        'dataset': dataset_hash,
+        'pipeline_version': pipeline.PIPELINE_VERSION,
+        'params': task.params,
+        'code': code_hash(code),
+        'savefig': SAVEFIG_KWARGS,
+        'vector': VECTOR_FORMAT,
+    }
+    return json.loads(json.dumps(inputs, sort_keys=True, default=str))
+
+
+def load_manifest(out_dir):
+    """Read the manifest in `out_dir`, or an empty one if there is none."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def update_manifest(out_dir, entries):
+    """Merge `entries` into the manifest in `out_dir`."""
+    if not entries:
+        return
+    # Re-read so entries written by the other generate_*.py scripts are kept
+    manifest = load_manifest(out_dir)
+    manifest.update(entries)
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def display_path(path):
+    """Path relative to the project directory when it lies inside it."""
+    relative = os.path.relpath(path, HERE)
+    return path if relative.startswith(os.pardir) else relative
+
+
+def vector_path(path):
+    """Path of the vector copy of the PNG at `path`."""
+    return f'{os.path.splitext(path)[0]}.{VECTOR_FORMAT}'
+
+
+def render(func, path, setup=None):
+    """Draw one figure with `func` and save it to `path` and to vector_path(path)."""
+    if setup is not None:
+        setup()
+    fig = func()
+    try:
+        fig.tight_layout()
+        fig.savefig(path, **SAVEFIG_KWARGS)
+        with plt.rc_context(VECTOR_RC):
+            fig.savefig(vector_path(path), format=VECTOR_FORMAT, **VECTOR_KWARGS)
+    finally:
+        plt.close(fig)
+    return path
+
+
+def render_all(registry, jobs=1, out_dir=IMAGES_DIR, force=False, prepare=None):
+    """
+    Render the figures in `registry` whose inputs changed into `out_dir`.
+
+    Figures whose PNG and SVG exist and whose inputs match the manifest are
+    skipped unless `force` is true. `prepare` is called once, before
+    anything is drawn, only when there is something to render. With jobs=1
+    the figures are drawn in this process, one after another; otherwise
+    they are spread over a pool of `jobs` worker processes (jobs=0 uses one
+    per CPU). Whenever that comes to a single worker, the figures are drawn
+    in this process too. Returns the list of paths that were written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    dataset_hash = pipeline.dataset_hash()
+
+    stale = {}
+    for filename, task in registry:
+        path = os.path.join(out_dir, filename)
+        inputs = figure_inputs(registry, task, dataset_hash)
+        if (force or manifest.get(filename) != inputs or not os.path.exists(path)
+                or not os.path.exists(vector_path(path))):
+            stale[filename] = (task, path, inputs)
+
+    if not stale:
+        print(f"All {len(registry)} figures are up to date")
+        return []
+    print(f"{len(stale)} of {len(registry)} figures to render")
+    if prepare is not None:
+        prepare()
+
+    done = {}
+    # A single worker would only add the cost of starting a process
+    workers = min(jobs or os.cpu_count() or 1, len(stale))
+    try:
+        if workers == 1:
+            for filename, (task, path, inputs) in stale.items():
+                print(f"Generating {task.title}...")
+                render(task.func, path, registry.setup)
+                done[filename] = inputs
+                print(f"  ✓ Saved: {display_path(path)}")
+        else:
+            print(f"Rendering on {workers} workers...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(render, task.func, path, registry.setup): filename
+                           for filename, (task, path, _) in stale.items()}
+                for future in as_completed(futures):
+                    path = future.result()
+                    done[futures[future]] = stale[futures[future]][2]
+                    print(f"  ✓ Saved: {display_path(path)}")
+    finally:
+        # Record whatever was saved, even if a later figure failed
+        update_manifest(out_dir, done)
+    return [stale[filename][1] for filename in done]
+
+
+def parse_args(description, argv=None):
+    """Command-line options shared by the generate_*.py scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='number of worker processes (default: one per CPU, 1 to render serially)')
+    parser.add_argument('--out-dir', default=IMAGES_DIR,
+                        help='directory the PNGs and SVGs are written to (default: %(default)s)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-render every figure, ignoring the manifest')
+    return parser.parse_args(argv)
+
+
+def main(registry, description, argv=None, prepare=None):
+    """Entry point for a generate_*.py script: parse options and render."""
+    args = parse_args(description, argv)
+    start = time.perf_counter()
+    written = render_all(registry, jobs=args.jobs, out_dir=args.out_dir,
+                         force=args.force, prepare=prepare)
+    print(f"\n✅ Rendered {len(written)} figures in {time.perf_counter() - start:.1f}s")
+    print(f"Images saved in: {os.path.abspath(args.out_dir)}")
@@ -0,0 +1,214 @@
+"""
+On-disk registry of the fitted Titanic models and their feature scaler.
+
+03_modeling.ipynb used to pickle every model to models/<name>.pkl and the
+scaler to models/scaler.pkl, and anything that needed a model unpickled
+it again, once per use, and then had to remember which models take the
+standardised features (the hard-coded ['Logistic Regression', 'SVM']).
+save_models() instead writes each estimator with joblib, uncompressed so
+that its numpy arrays can be memory-mapped, to a file named after the
+model and a digest of its bytes. It also writes a JSON index that records,
+for every model, its file, digest, estimator class and whether it takes
+the scaled or the raw features. The index is replaced last and atomically,
+so a reader never sees half a registry.
+
+ModelRegistry reads the index and loads each model on first use only.
+The arrays of array-heavy estimators (the SVM's support vectors, the
+scaler) are memory-mapped copy-on-write, so they are paged in from the
+file rather than copied, yet stay writable for libsvm, which rejects
+read-only buffers. Estimators that rebuild their own structures on
+unpickling (the tree ensembles, XGBoost's booster) are read normally. load_registry() returns
+one registry per directory per process, so every caller shares the loaded
+models. inputs() and input_views() hand each model the feature matrix it
+was trained on.
+"""
+
+import functools
+import hashlib
+import json
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join(HERE, 'models', 'registry')
+INDEX_NAME = 'index.json'
+
+# Bump when the index format or the file layout changes
+REGISTRY_VERSION = 1
+
+SCALED = 'scaled'
+RAW = 'raw'
+SCALER = 'scaler'
+
+
+def model_slug(name):
+    """File-name stem of model `name` (e.g. 'random_forest')."""
+    return name.lower().replace(' ', '_')
+
+
+def file_digest(path):
+    """SHA-256 hex digest of the bytes of `path`."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dump_estimator(estimator, path, stem):
+    """Write `estimator` to `path` as <stem>-<digest>.joblib; return its index entry."""
+    import joblib
+
+    # Unique per process, so concurrent saves never write the same file
+    tmp = os.path.join(path, f'{stem}.joblib.{os.getpid()}.tmp')
+    joblib.dump(estimator, tmp)
+    digest = file_digest(tmp)
+    filename = f'{stem}-{digest[:16]}.joblib'
+    os.replace(tmp, os.path.join(path, filename))
+    cls = type(estimator)
+    return {
+        'file': filename,
+        'sha256': digest,
+        'estimator': f'{cls.__module__}.{cls.__qualname__}',
+        'bytes': os.path.getsize(os.path.join(path, filename)),
+    }
+
+
+def save_models(models, scaler=None, scaled=(), feature_names=None, path=REGISTRY_DIR):
+    """
+    Write `models` (name -> fitted estimator) and `scaler` to the registry.
+
+    `scaled` names the models that were trained on the scaler's output;
+    the others take the raw features. `feature_names` records the input
+    columns. Files of a previous save that the new index no longer refers
+    to are removed. Returns the index.
+    """
+    scaled = set(scaled)
+    unknown = scaled - set(models)
+    if unknown:
+        raise ValueError(f"Scaled models not in `models`: {sorted(unknown)}")
+    if scaled and scaler is None:
+        raise ValueError("Scaled models need the scaler")
+
+    os.makedirs(path, exist_ok=True)
+    index = {
+        'version': REGISTRY_VERSION,
+        'feature_names': list(feature_names) if feature_names is not None else None,
+        'scaler': dump_estimator(scaler, path, SCALER) if scaler is not None else None,
+        'models': {},
+    }
+    for name, model in models.items():
+        entry = dump_estimator(model, path, model_slug(name))
+        entry['input'] = SCALED if name in scaled else RAW
+        index['models'][name] = entry
+
+    tmp = os.path.join(path, f'{INDEX_NAME}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, os.path.join(path, INDEX_NAME))
+
+    keep = {entry['file'] for entry in index['models'].values()}
+    if index['scaler']:
+        keep.add(index['scaler']['file'])
+    for filename in os.listdir(path):
+        if filename.endswith('.joblib') and filename not in keep:
+            os.remove(os.path.join(path, filename))
+    return index
+
+
+class ModelRegistry:
+    """
+    Read-only view of a saved registry, loading each model at most once.
+
+    Iterating gives the model names in the order they were saved.
+    `mmap_mode` is passed to joblib.load(). Keep the default 'c'
+    (copy-on-write) rather than 'r', which libsvm cannot predict from;
+    use None to read every array into memory.
+    """
+
+    def __init__(self, path=REGISTRY_DIR, mmap_mode='c'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        if self.index.get('version') != REGISTRY_VERSION:
+            raise ValueError(f"Registry {path} has format version {self.index.get('version')}, "
+                             f"expected {REGISTRY_VERSION}; re-run 03_modeling.ipynb")
+        self._loaded = {}
+
+    def __contains__(self, name):
+        return name in self.index['models']
+
+    def __iter__(self):
+        return iter(self.index['models'])
+
+    def __len__(self):
+        return len(self.index['models'])
+
+    @property
+    def names(self):
+        return list(self.index['models'])
+
+    @property
+    def feature_names(self):
+        return self.index['feature_names']
+
+    def entry(self, name):
+        """Index entry of model `name` (file, sha256, estimator, bytes, input)."""
+        return self.index['models'][name]
+
+    def digest(self, name):
+        """SHA-256 of model `name`'s file, a key for anything derived from the model."""
+        return self.entry(name)['sha256']
+
+    def is_scaled(self, name):
+        """Whether model `name` takes the scaled features."""
+        return self.entry(name)['input'] == SCALED
+
+    def _load(self, key, entry):
+        import joblib
+
+        if key not in self._loaded:
+            self._loaded[key] = joblib.load(os.path.join(self.path, entry['file']),
+                                            mmap_mode=self.mmap_mode)
+        return self._loaded[key]
+
+    def model(self, name):
+        """Fitted model `name`, read from disk on first use."""
+        return self._load(name, self.entry(name))
+
+    def models(self):
+        """Every model, by name (loading those not yet loaded)."""
+        return {name: self.model(name) for name in self}
+
+    @property
+    def scaler(self):
+        """The fitted feature scaler, or None if none was saved."""
+        entry = self.index['scaler']
+        return self._load(SCALER, entry) if entry else None
+
+    def inputs(self, name, X):
+        """The view of features `X` that model `name` was trained on."""
+        return self.scaler.transform(X) if self.is_scaled(name) else X
+
+    def input_views(self, X):
+        """
+        Inputs of the models that do not take `X` as is, by name.
+
+        `X` is scaled once and shared by all the scaled models; the result
+        can be passed as scoring.score_models(inputs=...).
+        """
+        scaled = [name for name in self if self.is_scaled(name)]
+        if not scaled:
+            return {}
+        X_scaled = self.scaler.transform(X)
+        return {name: X_scaled for name in scaled}
+
+    def predict_proba(self, name, X):
+        """Positive-class probabilities of model `name` on features `X`."""
+        return self.model(name).predict_proba(self.inputs(name, X))[:, 1]
+
+
+@functools.lru_cache(maxsize=None)
+def load_registry(path=REGISTRY_DIR, mmap_mode='c'):
+    """The registry at `path`, shared by every caller in this process."""
+    return ModelRegistry(path, mmap_mode)
@@ -0,0 +1,384 @@
+"""
+Shared feature pipeline for the Titanic analysis.
+
+The cleaning and feature engineering steps used to be copy-pasted into every
+script and notebook. They now live here, and the engineered frame, the
+feature columns, the train/test split indices and the cross-validation fold
+of every training row are materialised once to an on-disk cache keyed on the
+CSV bytes and PIPELINE_VERSION. Bump PIPELINE_VERSION whenever the output of
+engineer_features() or of the splits changes.
+
+The cache is a column store: a directory with one .npy file per column plus
+a small JSON schema. Every column is stored in the narrowest dtype that
+holds it exactly (int8 flags and counts, float32 where no precision is
+lost, bool one-hot blocks), and string columns as integer category codes.
+Columns are opened as read-only memory maps, and a reader only touches the
+files of the columns it asks for, so the model code never pays for the
+Name, Ticket and Cabin strings.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+PIPELINE_VERSION = 2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(HERE, 'data', 'titanic.csv')
+CACHE_DIR = os.path.join(HERE, '.cache')
+
+TITLE_MAPPING = {
+    'Mr': 'Mr', 'Miss': 'Miss', 'Mrs': 'Mrs', 'Master': 'Master',
+    'Dr': 'Rare', 'Rev': 'Rare', 'Col': 'Rare', 'Major': 'Rare',
+    'Mlle': 'Miss', 'Countess': 'Rare', 'Ms': 'Miss', 'Lady': 'Rare',
+    'Jonkheer': 'Rare', 'Don': 'Rare', 'Dona': 'Rare', 'Mme': 'Mrs',
+    'Capt': 'Rare', 'Sir': 'Rare'
+}
+# Categories of the Title column, in the (sorted) order of its one-hot block
+TITLES = ['Master', 'Miss', 'Mr', 'Mrs', 'Rare']
+# "Surname, Title. Given names"
+TITLE_PATTERN = re.compile(r' ([A-Za-z]+)\.')
+
+# load_features(columns=MODEL_COLUMNS) loads only the features and the target
+MODEL_COLUMNS = 'model'
+
+# Columns that are kept in the engineered frame but are not model features
+NON_FEATURE_COLUMNS = ['PassengerId', 'Name', 'Ticket', 'Cabin',
+                       'Embarked', 'Title', 'AgeGroup', 'Survived']
+
+TEST_SIZE = 0.2
+N_FOLDS = 5
+RANDOM_STATE = 42
+
+
+def load_raw(path=DATA_PATH, columns=None):
+    """Load the raw Titanic CSV, optionally parsing only `columns`."""
+    return pd.read_csv(path, usecols=columns)
+
+
+def dataset_hash(path=DATA_PATH):
+    """Return the SHA-256 hex digest of the raw CSV bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path=DATA_PATH):
+    """Cache key combining the dataset hash and the pipeline version."""
+    return f"{dataset_hash(path)[:16]}-v{PIPELINE_VERSION}"
+
+
+def fill_group_median(data, column, keys, fallback=True):
+    """
+    Fill missing values of `column` with the median of their `keys` group.
+
+    Gives the same result as
+    ``data.groupby(keys)[column].transform(lambda x: x.fillna(x.median()))``
+    but computes every group median in a single cythonised aggregation and
+    fills by indexing with the group codes, so there is no per-group Python
+    callback. Values left missing (groups with no observed value, or rows
+    with missing keys) are filled with the global median when `fallback` is
+    true.
+    """
+    if isinstance(keys, str):
+        keys = [keys]
+    values = data[column]
+    missing = values.isna().to_numpy()
+    if not missing.any():
+        return values.astype(float)
+
+    grouped = data.groupby(list(keys), sort=False, dropna=True, observed=True)
+    medians = grouped[column].median().to_numpy(dtype=float)
+    # ngroup() is NaN for rows whose keys were dropped, so work in float
+    codes = grouped.ngroup().to_numpy(dtype=float)[missing]
+    has_group = ~np.isnan(codes)
+
+    fill = np.full(len(codes), np.nan)
+    fill[has_group] = medians[codes[has_group].astype(np.intp)]
+
+    result = values.to_numpy(dtype=float, copy=True)
+    result[missing] = fill
+    if fallback:
+        result[np.isnan(result)] = values.median()
+    return pd.Series(result, index=data.index, name=column)
+
+
+def extract_title(names):
+    """
+    Title group (Mr, Miss, Mrs, Master or Rare) of every passenger name.
+
+    Returns a categorical Series with the fixed categories TITLES, so the
+    one-hot block always has the same columns and the column is stored as
+    int8 codes. Each distinct name is parsed once: the names are factorised,
+    the pattern runs over the unique values only, and the result is
+    broadcast back through the codes. Missing names and names without a
+    known title are Rare.
+    """
+    codes, uniques = pd.factorize(names)
+    titles = pd.Series(uniques).str.extract(TITLE_PATTERN, expand=False)
+    lookup = pd.Categorical(titles.map(TITLE_MAPPING).fillna('Rare'), categories=TITLES).codes
+    # Code -1 (missing name) picks the trailing Rare
+    lookup = np.append(lookup, TITLES.index('Rare')).astype(np.int8)
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=TITLES),
+                     index=names.index, name=names.name)
+
+
+def encode_categoricals(data):
+    """Encode Sex as 0/1 and append one-hot blocks for Embarked, Title and AgeGroup."""
+    data = data.copy(deep=False)
+    data['Sex'] = (data['Sex'] == 'female').astype(int)
+    embarked_dummies = pd.get_dummies(data['Embarked'], prefix='Embarked')
+    title_dummies = pd.get_dummies(data['Title'], prefix='Title')
+    agegroup_dummies = pd.get_dummies(data['AgeGroup'], prefix='AgeGroup')
+    return pd.concat([data, embarked_dummies, title_dummies, agegroup_dummies], axis=1)
+
+
+def add_features(data):
+    """Add the cabin, family, age-group and fare features to the imputed `data` in place."""
+    data['HasCabin'] = data['Cabin'].notna().astype(int)
+    data['FamilySize'] = data['SibSp'] + data['Parch'] + 1
+    data['IsAlone'] = (data['FamilySize'] == 1).astype(int)
+    data['AgeGroup'] = pd.cut(data['Age'], bins=[0, 12, 18, 35, 60, 100],
+                              labels=['Child', 'Teen', 'Adult', 'Middle', 'Senior'])
+    data['FarePerPerson'] = data['Fare'] / data['FamilySize']
+    data['FareLog'] = np.log1p(data['Fare'])
+    return data
+
+
+def engineer_features(raw_data):
+    """Apply the cleaning and feature engineering steps from 02_cleaning."""
+    data = raw_data.copy()
+
+    # Extract Title
+    data['Title'] = extract_title(data['Name'])
+
+    # Impute Age
+    data['Age'] = fill_group_median(data, 'Age', ['Pclass', 'Title'])
+
+    # Impute Embarked and Fare
+    data['Embarked'] = data['Embarked'].fillna(data['Embarked'].mode()[0])
+    data['Fare'] = fill_group_median(data, 'Fare', 'Pclass', fallback=False)
+
+    # Feature engineering
+    add_features(data)
+
+    # Encode categoricals
+    return encode_categoricals(data)
+
+
+def feature_columns(data):
+    """Columns of the engineered frame that are used as model inputs."""
+    return [col for col in data.columns if col not in NON_FEATURE_COLUMNS]
+
+
+def split_indices(y, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """Positional indices of the stratified train/test split."""
+    from sklearn.model_selection import train_test_split
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=test_size, random_state=random_state, stratify=y
+    )
+    return train_idx.astype(np.int32), test_idx.astype(np.int32)
+
+
+def fold_ids(y, n_splits=N_FOLDS, random_state=RANDOM_STATE):
+    """
+    Fold number of every row under shuffled stratified K-fold.
+
+    One int8 per row is all that is needed to rebuild every (train,
+    validation) pair; see Folds.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    ids = np.empty(len(y), dtype=np.int8)
+    for fold, (_, val_idx) in enumerate(cv.split(np.zeros(len(y)), y)):
+        ids[val_idx] = fold
+    return ids
+
+
+class Folds:
+    """
+    Cross-validation splitter replaying precomputed fold numbers.
+
+    Accepted wherever scikit-learn takes a `cv` argument. split() ignores
+    its arguments, so every model, search and worker process sees exactly
+    the same folds without re-running StratifiedKFold.
+    """
+
+    def __init__(self, fold_ids):
+        self.fold_ids = np.asarray(fold_ids)
+        self.n_splits = int(self.fold_ids.max()) + 1
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        return self.n_splits
+
+    def split(self, X=None, y=None, groups=None):
+        """Yield the positional train and validation indices of each fold."""
+        for fold in range(self.n_splits):
+            yield self.indices(fold)
+
+    def indices(self, fold):
+        """Positional train and validation indices of fold `fold`."""
+        val = self.fold_ids == fold
+        return np.flatnonzero(~val), np.flatnonzero(val)
+
+
+def build_features(path=DATA_PATH):
+    """Run the full pipeline without touching the cache."""
+    data = engineer_features(load_raw(path))
+    train_idx, test_idx = split_indices(data['Survived'])
+    return {
+        'data': data,
+        'feature_cols': feature_columns(data),
+        'train_idx': train_idx,
+        'test_idx': test_idx,
+        'fold_ids': fold_ids(data['Survived'].iloc[train_idx]),
+    }
+
+
+def compact_column(values):
+    """
+    Narrowest exact array for a column, plus its schema entry.
+
+    Integers are downcast to the smallest integer dtype, floats to float32
+    when that loses nothing, and strings and categoricals become integer
+    codes (-1 for missing) with the categories kept in the schema.
+    """
+    schema = {}
+    if isinstance(values.dtype, pd.CategoricalDtype) or not (
+            pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)):
+        categorical = pd.Categorical(values)
+        schema['categories'] = categorical.categories.tolist()
+        schema['ordered'] = bool(categorical.ordered)
+        array = pd.to_numeric(pd.Series(categorical.codes), downcast='integer').to_numpy()
+    elif pd.api.types.is_bool_dtype(values):
+        array = values.to_numpy(dtype=bool)
+    elif pd.api.types.is_integer_dtype(values):
+        array = pd.to_numeric(values, downcast='integer').to_numpy()
+    else:
+        array = values.to_numpy(dtype=np.float64)
+        narrow = array.astype(np.float32)
+        if np.array_equal(narrow, array, equal_nan=True):
+            array = narrow
+    schema['dtype'] = array.dtype.str
+    return array, schema
+
+
+def write_columns(data, path, arrays=None, meta=None, replace=False):
+    """
+    Write `data` to the column store directory `path`.
+
+    `arrays` are extra named arrays saved next to the columns, and `meta`
+    extra JSON-serialisable entries for the schema. The store is written to
+    a temporary directory and renamed into place, so concurrent readers
+    never see a partial cache. Stores are keyed on their contents, so an
+    existing store at `path` is kept unless `replace` is true; it is then
+    renamed aside and only deleted once the new store is in place.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(tmp_path)
+    schema = {'length': len(data), 'columns': {}, 'arrays': sorted(arrays or {}), **(meta or {})}
+    for i, column in enumerate(data.columns):
+        array, schema['columns'][column] = compact_column(data[column])
+        schema['columns'][column]['file'] = f'c{i:03d}.npy'
+        np.save(os.path.join(tmp_path, f'c{i:03d}.npy'), array)
+    for name, array in (arrays or {}).items():
+        np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+    with open(os.path.join(tmp_path, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=1)
+
+    old_path = None
+    if replace and os.path.exists(path):
+        old_path = f'{path}.{os.getpid()}.old'
+        try:
+            os.rename(path, old_path)
+        except OSError:
+            old_path = None  # another process moved it first
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process finished the same store first
+        shutil.rmtree(tmp_path)
+    if old_path is not None:
+        shutil.rmtree(old_path)
+
+
+def read_schema(path):
+    """Schema of the column store at `path`."""
+    with open(os.path.join(path, 'schema.json')) as f:
+        return json.load(f)
+
+
+def read_columns(path, columns=None, mmap=True, schema=None):
+    """
+    Load `columns` (all by default) of the column store at `path`.
+
+    Numeric columns are read-only memory maps of their .npy files unless
+    `mmap` is False; categorical columns are decoded from their codes.
+    """
+    schema = schema or read_schema(path)
+    columns = list(schema['columns']) if columns is None else list(columns)
+    frame = {}
+    for column in columns:
+        entry = schema['columns'][column]
+        array = np.load(os.path.join(path, entry['file']), mmap_mode='r' if mmap else None)
+        if 'categories' in entry:
+            dtype = pd.CategoricalDtype(entry['categories'], ordered=entry['ordered'])
+            frame[column] = pd.Categorical.from_codes(array, dtype=dtype)
+        else:
+            frame[column] = array
+    return pd.DataFrame(frame, columns=columns, copy=False)
+
+
+def load_features(path=DATA_PATH, cache_dir=CACHE_DIR, refresh=False, columns=None):
+    """
+    Load the engineered features, computing and caching them on a cold run.
+
+    Returns a dict with the engineered frame ('data'), the model input
+    columns ('feature_cols'), the positional split indices ('train_idx',
+    'test_idx'), the CV fold of every training row ('fold_ids') and the
+    cache 'key' they were built under. `columns` limits 'data' to the
+    given columns; pass MODEL_COLUMNS for the feature columns and the
+    target only.
+    """
+    key = cache_key(path)
+    cache_path = os.path.join(cache_dir, f'features-{key}')
+
+    if refresh or not os.path.exists(cache_path):
+        features = build_features(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        write_columns(features['data'], cache_path,
+                      arrays={name: features[name] for name in ['train_idx', 'test_idx', 'fold_ids']},
+                      meta={'feature_cols': features['feature_cols']}, replace=refresh)
+
+    schema = read_schema(cache_path)
+    if columns == MODEL_COLUMNS:
+        columns = schema['feature_cols'] + ['Survived']
+    features = {name: np.load(os.path.join(cache_path, f'{name}.npy'))
+                for name in schema['arrays']}
+    features['data'] = read_columns(cache_path, columns, schema=schema)
+    features['feature_cols'] = schema['feature_cols']
+    features['key'] = key
+    return features
+
+
+def split_frames(features):
+    """Return X_train, X_test, y_train, y_test from a load_features() result."""
+    data = features['data']
+    X = data[features['feature_cols']]
+    y = data['Survived']
+    train_idx, test_idx = features['train_idx'], features['test_idx']
+    return X.iloc[train_idx], X.iloc[test_idx], y.iloc[train_idx], y.iloc[test_idx]
+
+
+def cv_folds(features):
+    """Return the cached CV folds of a load_features() result as a Folds splitter."""
+    return Folds(features['fold_ids'])
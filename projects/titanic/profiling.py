@@ -0,0 +1,230 @@
+"""
+Single-pass dataset profile for the exploration notebook and figures.
+
+01_exploration.ipynb used to import ydata_profiling for a ProfileReport
+(the slowest and heaviest dependency of the build), and the notebook and
+generate_visualizations.py each scanned the data again for the missing
+counts (isnull().sum()), the correlation matrix (corr()) and the survival
+rate of every category (one groupby per column). profile() computes all
+of it at once:
+
+  - missing counts of every column, from a single isna() of the frame,
+  - count, mean, std, min, quantiles and max of every numeric column, and
+    a fixed-bin histogram of each, from one float matrix of the numeric
+    columns (one nanquantile call for the extremes and quantiles, one
+    bincount over all columns for the histograms),
+  - the Pearson correlation of the numeric columns over pairwise-complete
+    rows, as pandas computes it, from a few matrix products of the same
+    centred matrix the standard deviations come from,
+  - the target mean and count of every category of the low-cardinality
+    columns, from one factorize() and two bincount()s per column (columns
+    with too many values in their first rows are skipped unread).
+
+`sample` profiles a random subset of the rows instead, for quick looks at
+large tables. load_profile() keeps the profile of the CSV as JSON under
+.cache/profile, keyed on the dataset hash, PROFILE_VERSION and the
+options, so the notebook and the figures share one computation.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROFILE_CACHE_DIR = os.path.join(HERE, '.cache', 'profile')
+
+# Bump whenever the contents of a profile change
+PROFILE_VERSION = 1
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+BINS = 30
+# Columns with at most this many distinct values get per-category target rates
+MAX_CATEGORIES = 20
+CARDINALITY_PROBE = 10_000
+
+
+class Profile:
+    """
+    Summary of a table as computed by profile().
+
+    `missing` is the missing count of every column; `summary` has one row
+    per numeric column (count, mean, std, min, quantiles, max);
+    `histograms` maps numeric columns to (counts, bin edges);
+    `correlation` is the correlation matrix of the numeric columns; and
+    `target_rates` maps categorical columns to a frame of the target's
+    mean and count per category, sorted by category.
+    """
+
+    def __init__(self, n_rows, total_rows, target, missing, summary, histograms,
+                 correlation, target_rates):
+        self.n_rows = n_rows
+        self.total_rows = total_rows
+        self.target = target
+        self.missing = missing
+        self.summary = summary
+        self.histograms = histograms
+        self.correlation = correlation
+        self.target_rates = target_rates
+
+    @property
+    def sampled(self):
+        return self.n_rows < self.total_rows
+
+    def missing_table(self):
+        """Missing count and percentage of the columns with missing values, most first."""
+        missing = self.missing[self.missing > 0].sort_values(ascending=False)
+        return pd.DataFrame({'Missing Count': missing,
+                             'Percentage': missing / self.n_rows * 100})
+
+    def to_dict(self):
+        return {
+            'n_rows': self.n_rows,
+            'total_rows': self.total_rows,
+            'target': self.target,
+            'missing': self.missing.to_dict(),
+            'summary': json.loads(self.summary.to_json(orient='split')),
+            'histograms': {col: [counts.tolist(), edges.tolist()]
+                           for col, (counts, edges) in self.histograms.items()},
+            'correlation': json.loads(self.correlation.to_json(orient='split')),
+            'target_rates': {col: {'index': rates.index.tolist(),
+                                   'mean': rates['mean'].tolist(),
+                                   'count': rates['count'].tolist()}
+                             for col, rates in self.target_rates.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        def frame(split):
+            return pd.DataFrame(split['data'], index=split['index'], columns=split['columns'],
+                                dtype=float)
+
+        return cls(
+            d['n_rows'], d['total_rows'], d['target'],
+            pd.Series(d['missing'], dtype=np.int64),
+            frame(d['summary']),
+            {col: (np.array(counts, dtype=np.int64), np.array(edges))
+             for col, (counts, edges) in d['histograms'].items()},
+            frame(d['correlation']),
+            {col: pd.DataFrame({'mean': rates['mean'], 'count': rates['count']},
+                               index=pd.Index(rates['index'], name=col))
+             for col, rates in d['target_rates'].items()},
+        )
+
+
+def histograms(X, low, high, columns, bins):
+    """Counts and edges of `bins` equal-width bins from `low` to `high` of every column of `X`."""
+    width = np.where(high > low, high - low, 1.0)
+    # Same bins as np.histogram: the maximum falls in the last bin
+    idx = np.clip(np.floor((X - low) / width * bins), 0, bins - 1)
+    valid = ~np.isnan(idx)
+    flat = (idx + np.arange(X.shape[1]) * bins)[valid].astype(np.intp)
+    counts = np.bincount(flat, minlength=bins * X.shape[1]).reshape(X.shape[1], bins)
+    return {col: (counts[i], np.linspace(low[i], low[i] + width[i], bins + 1))
+            for i, col in enumerate(columns)}
+
+
+def pairwise_correlation(centred, present, columns):
+    """
+    Pearson correlation over pairwise-complete rows, like DataFrame.corr().
+
+    `centred` holds the columns minus their means, with 0 where `present`
+    is false. Centring does not change the correlation but keeps the sums
+    small.
+    """
+    M = present.astype(float)
+    n = M.T @ M
+    sx = centred.T @ M             # sum of column i over the rows where j is present
+    sxx = (centred * centred).T @ M
+    sxy = centred.T @ centred
+    cov = sxy - sx * sx.T / n
+    var = (sxx - sx * sx / n) * (sxx - sx * sx / n).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.sqrt(var)
+    corr[n < 2] = np.nan
+    np.fill_diagonal(corr, np.where(np.diag(n) >= 2, 1.0, np.nan))
+    return pd.DataFrame(np.clip(corr, -1, 1), index=columns, columns=columns)
+
+
+def target_rates(data, target, max_categories=MAX_CATEGORIES):
+    """Target mean and count per category of every column with few distinct values."""
+    y = data[target].to_numpy(dtype=float)
+    has_target = ~np.isnan(y)
+    rates = {}
+    for col in data.columns:
+        if col == target:
+            continue
+        # Rule out high-cardinality columns (names, ids, fares) on the first rows
+        if len(pd.unique(data[col].iloc[:CARDINALITY_PROBE])) > max_categories + 1:
+            continue
+        codes, uniques = pd.factorize(data[col], sort=True)
+        if len(uniques) > max_categories:
+            continue
+        keep = (codes >= 0) & has_target
+        counts = np.bincount(codes[keep], minlength=len(uniques))
+        sums = np.bincount(codes[keep], weights=y[keep], minlength=len(uniques))
+        with np.errstate(invalid='ignore'):
+            rates[col] = pd.DataFrame({'mean': sums / counts, 'count': counts},
+                                      index=pd.Index(np.asarray(uniques).tolist(), name=col))
+    return rates
+
+
+def profile(data, target='Survived', bins=BINS, quantiles=QUANTILES,
+            max_categories=MAX_CATEGORIES, sample=None, random_state=42):
+    """Profile of `data` (or of `sample` random rows of it); see Profile."""
+    total_rows = len(data)
+    if sample is not None and sample < total_rows:
+        data = data.sample(sample, random_state=random_state)
+
+    missing = data.isna().sum()
+
+    numeric = [col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])
+               and not pd.api.types.is_bool_dtype(data[col])]
+    X = data[numeric].to_numpy(dtype=float)
+    present = ~np.isnan(X)
+    count = present.sum(axis=0)
+    # One sort per column gives the extremes and the quantiles
+    qs = np.nanquantile(X, [0, *quantiles, 1], axis=0)
+    mean = np.where(present, X, 0.0).sum(axis=0) / count
+    centred = np.where(present, X - mean, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt((centred * centred).sum(axis=0) / (count - 1))
+    summary = pd.DataFrame({
+        'count': count.astype(float),
+        'mean': mean,
+        'std': std,
+        'min': qs[0],
+        **{f'{q:.0%}': row for q, row in zip(quantiles, qs[1:-1])},
+        'max': qs[-1],
+    }, index=numeric)
+
+    return Profile(len(data), total_rows, target, missing, summary,
+                   histograms(X, qs[0], qs[-1], numeric, bins),
+                   pairwise_correlation(centred, present, numeric),
+                   target_rates(data, target, max_categories))
+
+
+def load_profile(path=pipeline.DATA_PATH, cache_dir=PROFILE_CACHE_DIR, refresh=False, **options):
+    """
+    Profile of the CSV at `path`, computed once and cached.
+
+    `options` are passed to profile() and are part of the cache key.
+    """
+    key = json.dumps({'dataset': pipeline.dataset_hash(path), 'version': PROFILE_VERSION,
+                      'options': options}, sort_keys=True)
+    cache_path = os.path.join(cache_dir, f'{hashlib.sha256(key.encode()).hexdigest()[:16]}.json')
+    if not refresh and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return Profile.from_dict(json.load(f))
+
+    result = profile(pipeline.load_raw(path), **options)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(result.to_dict(), f)
+    os.replace(tmp_path, cache_path)
+    return result
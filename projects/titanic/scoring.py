@@ -0,0 +1,149 @@
+"""
+Single-pass model scoring for the Titanic evaluation figures and notebooks.
+
+Every model is scored on the test set exactly once: score_models() calls
+predict_proba() and predict() a single time per model and keeps the
+positive-class probabilities and predicted labels in a ScoreStore. The ROC,
+precision-recall, confusion-matrix and metric computations then read from
+the store instead of re-scoring the models, and the curves and AUCs come
+from one sorted sweep of all models' scores (see curves.py). The store is
+saved as a compressed .npz, so 04_results.ipynb can reuse the scores
+written by 03_modeling.ipynb without loading the pickled models. The .npz
+records the pipeline.cache_key() of the data it was scored on (dataset
+hash and PIPELINE_VERSION), and load() refuses a store scored on other
+data, whose rows would not line up with the current test split.
+"""
+
+import functools
+import os
+
+import numpy as np
+
+import curves
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCORES_PATH = os.path.join(HERE, 'models', 'test_scores.npz')
+
+METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc']
+
+
+class ScoreStore:
+    """Test-set probabilities and predicted labels for a set of models."""
+
+    def __init__(self, names, y_true, proba, labels, data_key=None):
+        self.names = list(names)
+        self.data_key = data_key
+        self.y_true = np.asarray(y_true)
+        self.proba = np.asarray(proba, dtype=float).reshape(len(self.names), -1)
+        self.labels = np.asarray(labels).reshape(len(self.names), -1)
+        self._rows = {name: i for i, name in enumerate(self.names)}
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def probabilities(self, name):
+        """Positive-class probabilities of model `name`."""
+        return self.proba[self._rows[name]]
+
+    def predictions(self, name):
+        """Predicted labels of model `name`."""
+        return self.labels[self._rows[name]]
+
+    @functools.cached_property
+    def curves(self):
+        """ROC/PR sweep of every model's probabilities, computed on first use."""
+        return curves.sweep(self.y_true, self.proba)
+
+    def roc_curve(self, name):
+        """fpr, tpr and thresholds of model `name`."""
+        return self.curves.roc(self._rows[name])
+
+    def pr_curve(self, name):
+        """precision, recall and thresholds of model `name`."""
+        return self.curves.pr(self._rows[name])
+
+    def roc_auc(self, name):
+        """Area under the ROC curve of model `name`."""
+        return float(self.curves.roc_auc[self._rows[name]])
+
+    def pr_auc(self, name):
+        """Area under the precision-recall curve of model `name`."""
+        return float(self.curves.pr_auc[self._rows[name]])
+
+    def metrics(self, name):
+        """Accuracy, precision, recall, F1 and ROC-AUC of model `name`."""
+        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+        y_pred = self.predictions(name)
+        return {
+            'accuracy': accuracy_score(self.y_true, y_pred),
+            'precision': precision_score(self.y_true, y_pred),
+            'recall': recall_score(self.y_true, y_pred),
+            'f1': f1_score(self.y_true, y_pred),
+            'roc_auc': self.roc_auc(name),
+        }
+
+    def confusion_matrix(self, name, normalize=False):
+        """2x2 confusion matrix of model `name`, optionally row-normalised."""
+        from sklearn.metrics import confusion_matrix
+
+        cm = confusion_matrix(self.y_true, self.predictions(name))
+        if normalize:
+            return cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
+        return cm
+
+    def save(self, path=SCORES_PATH):
+        """Write the store to `path` as a compressed .npz, atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                names=np.array(self.names),
+                y_true=self.y_true.astype(np.int8),
+                proba=self.proba,
+                labels=self.labels.astype(np.int8),
+                data_key=np.array(self.data_key or ''),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=SCORES_PATH, data_key=None):
+        """
+        Read a store written by save().
+
+        If `data_key` is given (a pipeline.cache_key()), raise ValueError
+        when the store was scored on other data, or does not say.
+        """
+        with np.load(path, allow_pickle=False) as npz:
+            stored_key = str(npz['data_key']) if 'data_key' in npz.files else ''
+            if data_key is not None and stored_key != data_key:
+                raise ValueError(f"Scores in {path} are for data {stored_key or 'unknown'}, "
+                                 f"not {data_key}; re-run 03_modeling.ipynb")
+            return cls(npz['names'].tolist(), npz['y_true'], npz['proba'], npz['labels'],
+                       stored_key or None)
+
+
+def score_models(models, X_test, y_test, inputs=None, data_key=None):
+    """
+    Score every model in `models` on the test set once.
+
+    `models` maps names to fitted classifiers. Each model is scored on
+    `X_test` unless `inputs` gives it a different matrix (e.g. the scaled
+    features for the linear models); the choice is made here once instead
+    of being re-derived wherever the scores are used. `data_key` names the
+    data the test set comes from (see ScoreStore.load()).
+    """
+    inputs = inputs or {}
+    proba, labels = [], []
+    for name, model in models.items():
+        X = inputs.get(name, X_test)
+        proba.append(model.predict_proba(X)[:, 1])
+        labels.append(model.predict(X))
+    return ScoreStore(list(models), np.asarray(y_test), proba, labels, data_key)
@@ -0,0 +1,304 @@
+"""
+Shared-pool successive-halving hyperparameter search for 03_modeling.
+
+03_modeling used to run one blocking GridSearchCV / RandomizedSearchCV per
+model family, each evaluating every candidate on every fold. run_search()
+instead puts the candidates of all families through one joblib worker pool
+and prunes them by successive halving: every candidate is scored on the
+first few folds, only the best 1/`factor` of each family goes on to more
+folds, and only the survivors of the last rung are scored on all of them.
+
+Each fold-level score is appended to a JSON-lines log under .cache/search,
+keyed on the estimator, its parameters, the fold and a hash of the data.
+Re-running the search (e.g. re-executing the notebook) reads the log and
+only fits what is missing, so an interrupted search resumes where it
+stopped.
+
+The feature matrices are written once to .npy files in the same cache
+directory and handed to the workers as read-only memory maps. joblib
+pickles a memory-mapped array as a reference to its file, so starting a
+worker costs the same whatever the size of the data, and every worker
+reads the same pages of the page cache instead of holding its own copy.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEARCH_CACHE_DIR = os.path.join(HERE, '.cache', 'search')
+
+
+class SearchSpace:
+    """
+    Candidates of one model family.
+
+    Give `param_grid` to try every combination (as GridSearchCV does) or
+    `param_distributions` and `n_iter` to sample them (as
+    RandomizedSearchCV does). `refit_params` are set on the best estimator
+    only, for settings that are needed afterwards but only slow the search
+    down, such as SVC(probability=True). `scaled` records whether `X` is
+    the standardised feature matrix, for model_registry.save_models().
+    """
+
+    def __init__(self, estimator, X, param_grid=None, param_distributions=None,
+                 n_iter=10, random_state=None, refit_params=None, scaled=False):
+        if (param_grid is None) == (param_distributions is None):
+            raise ValueError("Give exactly one of param_grid and param_distributions")
+        self.estimator = estimator
+        self.X = X
+        if param_grid is not None:
+            self.candidates = list(ParameterGrid(param_grid))
+        else:
+            self.candidates = list(ParameterSampler(param_distributions, n_iter,
+                                                    random_state=random_state))
+        self.refit_params = refit_params or {}
+        self.scaled = scaled
+
+
+class SearchResult:
+    """Outcome of one family's search, with GridSearchCV-style attributes."""
+
+    def __init__(self, best_params, best_score, best_estimator, cv_results):
+        self.best_params_ = best_params
+        self.best_score_ = best_score
+        self.best_estimator_ = best_estimator
+        self.cv_results_ = cv_results
+
+
+def array_hash(*arrays):
+    """SHA-256 hex digest of the contents of `arrays`."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        if hasattr(array, 'columns'):
+            digest.update(repr(list(array.columns)).encode())
+        array = np.asarray(array)
+        if array.dtype == object:
+            # Mixed-dtype frames come out as object arrays of pointers
+            array = array.astype(float)
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def shared_array(X, cache_dir=SEARCH_CACHE_DIR):
+    """
+    Read-only memory map of `X` as float64, exported on first use.
+
+    The .npy file is named after the contents of `X`, so each distinct
+    matrix is written once and reused by later searches.
+    """
+    path = os.path.join(cache_dir, f'X-{array_hash(X)[:16]}.npy')
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(np.asarray(X, dtype=np.float64)))
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
+
+def task_key(estimator, params, fold, data_hash, scoring):
+    """Cache key of one (estimator, parameters, fold) evaluation."""
+    base = {k: v for k, v in estimator.get_params(deep=False).items() if k not in params}
+    spec = {
+        'estimator': type(estimator).__module__ + '.' + type(estimator).__qualname__,
+        'base': repr(sorted(base.items())),
+        'params': repr(sorted(params.items())),
+        'fold': fold,
+        'data': data_hash,
+        'scoring': scoring,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def load_log(path):
+    """
+    Fold scores recorded in the log at `path`, keyed by task key.
+
+    Failed fits are logged with their error but left out, so that a
+    transient failure (memory, a killed worker) is retried on the next run.
+    """
+    scores = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                if 'error' in record:
+                    continue
+                scores[record['key']] = record['score']
+    except FileNotFoundError:
+        pass
+    return scores
+
+
+def fit_and_score(estimator, params, X, y, train_idx, val_idx, scoring):
+    """
+    Fit a clone of `estimator` with `params` on one fold and score it.
+
+    Returns (score, error). A candidate that fails to fit or score gets a
+    NaN score and the error message instead of stopping the search, as
+    error_score=np.nan does in GridSearchCV.
+    """
+    try:
+        model = clone(estimator).set_params(**params)
+        X_tr, X_val = _rows(X, train_idx), _rows(X, val_idx)
+        # Workers do not inherit the notebook's warning filters
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model.fit(X_tr, _rows(y, train_idx))
+            return get_scorer(scoring)(model, X_val, _rows(y, val_idx)), None
+    except Exception as e:
+        return float('nan'), f'{type(e).__name__}: {e}'
+
+
+def refit(estimator, params, X, y):
+    """Fit a clone of `estimator` with `params` on all of `X`."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return clone(estimator).set_params(**params).fit(X, y)
+
+
+def _rows(data, idx):
+    """Positional row selection for arrays and pandas objects alike."""
+    return data.iloc[idx] if hasattr(data, 'iloc') else data[idx]
+
+
+def rung_schedule(n_folds, min_folds, factor):
+    """Number of folds each rung is scored on, ending with all of them."""
+    rungs = []
+    folds = min(max(min_folds, 1), n_folds)
+    while folds < n_folds:
+        rungs.append(folds)
+        folds *= factor
+    return rungs + [n_folds]
+
+
+def run_search(spaces, y, cv, scoring='roc_auc', factor=3, min_folds=1,
+               n_jobs=-1, cache_dir=SEARCH_CACHE_DIR, verbose=True):
+    """
+    Search every family in `spaces` (a name -> SearchSpace dict) at once.
+
+    `cv` is any scikit-learn splitter; pass pipeline.cv_folds() to reuse the
+    cached folds instead of re-splitting.
+
+    A fit that raises scores NaN on its fold (with a warning, and the error
+    in the log) and ranks its candidate last; the search only fails if
+    every candidate of a family does. Failed fits are not cached, so the
+    next run tries them again.
+
+    All (candidate, fold) fits of a rung, across families, go to the same
+    joblib pool. After each rung, only the top ceil(n / `factor`) candidates
+    of each family, ranked by their mean score so far, are kept. Returns a
+    name -> SearchResult dict whose best estimators are refit on the whole
+    training set.
+    """
+    folds = list(cv.split(np.zeros(len(y)), y))
+    y_values = np.asarray(y)
+    rungs = rung_schedule(len(folds), min_folds, factor)
+    fold_hash = array_hash(*[idx for fold in folds for idx in fold])
+    data_hashes = {name: array_hash(space.X, y, fold_hash.encode()) for name, space in spaces.items()}
+
+    # Workers attach to these instead of unpickling a copy of the data
+    shared = {name: shared_array(space.X, cache_dir) for name, space in spaces.items()}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    log_path = os.path.join(cache_dir, 'fold_scores.jsonl')
+    cached = load_log(log_path)
+
+    alive = {name: list(range(len(space.candidates))) for name, space in spaces.items()}
+    scores = {name: {} for name in spaces}  # (candidate, fold) -> score
+
+    with Parallel(n_jobs=n_jobs, return_as='generator') as parallel:
+        for n_folds in rungs:
+            tasks = []
+            for name, space in spaces.items():
+                for cand in alive[name]:
+                    params = space.candidates[cand]
+                    for fold in range(n_folds):
+                        if (cand, fold) in scores[name]:
+                            continue
+                        key = task_key(space.estimator, params, fold, data_hashes[name], scoring)
+                        if key in cached:
+                            scores[name][cand, fold] = cached[key]
+                        else:
+                            tasks.append((name, cand, fold, key))
+
+            if verbose:
+                n_alive = sum(len(c) for c in alive.values())
+                print(f"Rung {n_folds}/{len(folds)} folds: {n_alive} candidates, "
+                      f"{len(tasks)} fits to run")
+
+            results = parallel(
+                delayed(fit_and_score)(spaces[name].estimator, spaces[name].candidates[cand],
+                                       shared[name], y_values, *folds[fold], scoring)
+                for name, cand, fold, key in tasks
+            )
+            with open(log_path, 'a') as log:
+                # Results first, so the generator is exhausted even with no tasks
+                for (score, error), (name, cand, fold, key) in zip(results, tasks):
+                    scores[name][cand, fold] = float(score)
+                    record = {'key': key, 'score': float(score)}
+                    if error is not None:
+                        record['error'] = error
+                        warnings.warn(f"{name} candidate {spaces[name].candidates[cand]} failed "
+                                      f"on fold {fold}, scored NaN: {error}")
+                    log.write(json.dumps(record) + '\n')
+                    log.flush()
+
+            if n_folds < len(folds):
+                for name in spaces:
+                    ranked = sorted(alive[name], reverse=True,
+                                    key=lambda c: _rank_score(scores[name], c, n_folds))
+                    alive[name] = ranked[:max(1, -(-len(ranked) // factor))]
+
+        best = {}
+        for name, space in spaces.items():
+            if all(np.isnan(score) for score in scores[name].values()):
+                raise ValueError(f"Every candidate of {name} failed to fit; "
+                                 f"the errors are logged in {log_path}")
+            cand = max(alive[name], key=lambda c: _rank_score(scores[name], c, len(folds)))
+            best[name] = cand
+        estimators = list(parallel(
+            delayed(refit)(spaces[name].estimator,
+                           {**spaces[name].candidates[cand], **spaces[name].refit_params},
+                           spaces[name].X, y)
+            for name, cand in best.items()
+        ))
+
+    results = {}
+    for (name, cand), estimator in zip(best.items(), estimators):
+        space = spaces[name]
+        cv_results = {
+            'params': space.candidates,
+            'n_folds': [sum(1 for c, _ in scores[name] if c == i) for i in range(len(space.candidates))],
+            'mean_test_score': [_mean_score(scores[name], i, len(folds))
+                                for i in range(len(space.candidates))],
+        }
+        results[name] = SearchResult(space.candidates[cand],
+                                     _mean_score(scores[name], cand, len(folds)),
+                                     estimator, cv_results)
+    return results
+
+
+def _mean_score(scores, cand, n_folds):
+    """Mean score of candidate `cand` over the folds it has been scored on."""
+    values = [scores[cand, fold] for fold in range(n_folds) if (cand, fold) in scores]
+    return float(np.mean(values)) if values else float('nan')
+
+
+def _rank_score(scores, cand, n_folds):
+    """Mean score for ranking, with failed or missing scores ranked last."""
+    score = _mean_score(scores, cand, n_folds)
+    return -np.inf if np.isnan(score) else score
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Out-of-core cleaning of passenger manifests larger than memory.
+
+pipeline.engineer_features() reads the whole CSV and imputes Age and Fare
+with exact group medians, which needs every value of a group in memory at
+once. clean_csv() instead streams the input in chunks of `chunksize` rows,
+in two passes:
+
+  1. Every chunk updates a quantile sketch of Age per (Pclass, Title)
+     group, of Fare per Pclass, and of both over all rows (the fallback
+     for groups with no observed value), plus the counts of each
+     embarkation port. Nothing else is kept.
+  2. Every chunk is imputed from the sketches' medians and the most
+     common port, gets the same engineered features and one-hot blocks as
+     engineer_features() (see pipeline.add_features() and
+     encode_categoricals()), and is appended to the output CSV.
+
+So peak memory is set by `chunksize`, not by the size of the input.
+
+QuantileSketch is a relative-error sketch in the style of DDSketch: a
+value x > 0 is counted in bucket ceil(log(x) / log(gamma)), with gamma =
+(1 + a) / (1 - a). Any quantile it returns is within a fraction `a` (the
+`relative_accuracy`) of a value of the right rank. Sketches merge by adding
+bucket counts, so pass 1 can be split across files or workers. Their size
+grows with the log of the value range, a few hundred buckets at 1%
+accuracy, whatever the number of rows. With exact medians replaced by
+sketched ones, the imputed values can differ from engineer_features() by
+up to `a`, and by a little more where a group has an even number of
+values, because pandas averages the two middle ones. The categorical
+blocks have fixed columns (all ports seen in pass 1, pipeline.TITLES and
+the age groups), so every chunk writes the same header.
+
+Usage (from projects/titanic):
+    python streaming.py data/titanic.csv /tmp/titanic_clean.csv --chunksize 100000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_ACCURACY = 0.01
+
+# Group keys of the imputed columns, as in engineer_features()
+AGE_KEYS = ['Pclass', 'Title']
+FARE_KEYS = ['Pclass']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of non-negative values with relative error.
+
+    Zeros are counted separately; NaNs are ignored.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.zero_count = 0
+        self.offset = 0  # bucket index of counts[0]
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.counts.sum())
+
+    def _add_counts(self, offset, counts):
+        if not len(self.counts):
+            self.offset, self.counts = offset, counts.astype(np.int64)
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.counts), offset + len(counts))
+        merged = np.zeros(high - low, dtype=np.int64)
+        merged[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+        merged[offset - low:offset - low + len(counts)] += counts
+        self.offset, self.counts = low, merged
+
+    def add(self, values):
+        """Count every non-missing value of `values`."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if (values < 0).any():
+            raise ValueError("QuantileSketch only holds non-negative values")
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        if len(positive):
+            keys = np.ceil(np.log(positive) / self.log_gamma).astype(np.int64)
+            low = int(keys.min())
+            self._add_counts(low, np.bincount(keys - low))
+        return self
+
+    def merge(self, other):
+        """Add the counts of `other`, a sketch of the same accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        self.zero_count += other.zero_count
+        if len(other.counts):
+            self._add_counts(other.offset, other.counts)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile `q` (0 to 1), or NaN if the sketch is empty."""
+        n = self.count
+        if not n:
+            return np.nan
+        rank = q * (n - 1)
+        if rank < self.zero_count:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        # Midpoint of the bucket's range (gamma^(k-1), gamma^k], in relative terms
+        return float(2 * self.gamma ** (self.offset + bucket) / (self.gamma + 1))
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class GroupSketches:
+    """A QuantileSketch of one column per group of key columns, and one over all rows."""
+
+    def __init__(self, column, keys, relative_accuracy=DEFAULT_ACCURACY):
+        self.column = column
+        self.keys = list(keys)
+        self.relative_accuracy = relative_accuracy
+        self.groups = {}
+        self.overall = QuantileSketch(relative_accuracy)
+
+    def update(self, chunk):
+        """Add the values of `column` in `chunk`, grouped by `keys`."""
+        values = chunk[self.column].to_numpy(dtype=float)
+        self.overall.add(values)
+        grouped = chunk.groupby(self.keys, sort=False, dropna=True, observed=True)
+        for key, rows in grouped.indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            if key not in self.groups:
+                self.groups[key] = QuantileSketch(self.relative_accuracy)
+            self.groups[key].add(values[rows])
+        return self
+
+    def merge(self, other):
+        """Add the counts of `other`, sketches of the same column and keys."""
+        self.overall.merge(other.overall)
+        for key, sketch in other.groups.items():
+            if key in self.groups:
+                self.groups[key].merge(sketch)
+            else:
+                self.groups[key] = QuantileSketch(self.relative_accuracy).merge(sketch)
+        return self
+
+    def medians(self):
+        """Median of every group, as a Series indexed by the key columns."""
+        index = pd.MultiIndex.from_tuples(list(self.groups), names=self.keys)
+        return pd.Series([sketch.median() for sketch in self.groups.values()],
+                         index=index, dtype=float)
+
+    def fill(self, chunk, fallback=True):
+        """
+        `column` of `chunk` with missing values set to their group's median.
+
+        Works like pipeline.fill_group_median() with sketched medians:
+        values left missing are set to the overall median if `fallback`.
+        """
+        values = chunk[self.column].to_numpy(dtype=float, copy=True)
+        missing = np.isnan(values)
+        if missing.any():
+            keys = pd.MultiIndex.from_frame(chunk.loc[missing, self.keys].astype(object))
+            values[missing] = self.medians().reindex(keys).to_numpy()
+            if fallback:
+                values[np.isnan(values)] = self.overall.median()
+        return pd.Series(values, index=chunk.index, name=self.column)
+
+
+class CleaningStats:
+    """Everything pass 1 learns about the input: the sketches and the port counts."""
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        self.age = GroupSketches('Age', AGE_KEYS, relative_accuracy)
+        self.fare = GroupSketches('Fare', FARE_KEYS, relative_accuracy)
+        self.ports = pd.Series(dtype=np.int64)
+        self.rows = 0
+
+    def update(self, chunk):
+        """Add a chunk of raw rows (with its Title column)."""
+        self.age.update(chunk)
+        self.fare.update(chunk)
+        self.ports = self.ports.add(chunk['Embarked'].value_counts(), fill_value=0)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        self.age.merge(other.age)
+        self.fare.merge(other.fare)
+        self.ports = self.ports.add(other.ports, fill_value=0)
+        self.rows += other.rows
+        return self
+
+    @property
+    def embarked_mode(self):
+        """Most common port; ties go to the first in sorted order, as Series.mode() does."""
+        return self.ports.sort_index().idxmax()
+
+
+def read_chunks(path, chunksize):
+    """Raw rows of the CSV at `path`, `chunksize` at a time, with their Title."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk['Title'] = pipeline.extract_title(chunk['Name'])
+        yield chunk
+
+
+def collect_stats(path, chunksize=DEFAULT_CHUNKSIZE, relative_accuracy=DEFAULT_ACCURACY):
+    """Pass 1: the CleaningStats of the whole CSV at `path`."""
+    stats = CleaningStats(relative_accuracy)
+    for chunk in read_chunks(path, chunksize):
+        stats.update(chunk)
+    return stats
+
+
+def clean_chunk(chunk, stats):
+    """Pass 2 for one chunk: the engineer_features() steps with sketched medians."""
+    chunk['Age'] = stats.age.fill(chunk)
+    ports = sorted(stats.ports.index)
+    chunk['Embarked'] = pd.Categorical(chunk['Embarked'].fillna(stats.embarked_mode),
+                                       categories=ports)
+    chunk['Fare'] = stats.fare.fill(chunk, fallback=False)
+    pipeline.add_features(chunk)
+    return pipeline.encode_categoricals(chunk)
+
+
+def clean_csv(path, output_path, chunksize=DEFAULT_CHUNKSIZE, relative_accuracy=DEFAULT_ACCURACY,
+              verbose=True):
+    """
+    Clean and engineer the CSV at `path` into `output_path`, in two streaming passes.
+
+    The output is written to a temporary file and moved into place at the
+    end, so an interrupted run leaves no partial table. Returns the
+    CleaningStats of the input.
+    """
+    start = time.time()
+    stats = collect_stats(path, chunksize, relative_accuracy)
+    if verbose:
+        print(f"Pass 1: {stats.rows:,} rows sketched in {time.time() - start:.1f}s")
+
+    start = time.time()
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        for i, chunk in enumerate(read_chunks(path, chunksize)):
+            clean_chunk(chunk, stats).to_csv(tmp_path, mode='w' if i == 0 else 'a',
+                                             header=i == 0, index=False)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if verbose:
+        print(f"Pass 2: {stats.rows:,} rows cleaned in {time.time() - start:.1f}s "
+              f"-> {output_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='raw passenger CSV')
+    parser.add_argument('output', help='cleaned CSV to write')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='rows read and written at a time')
+    parser.add_argument('--accuracy', type=float, default=DEFAULT_ACCURACY,
+                        help='relative accuracy of the sketched medians')
+    args = parser.parse_args()
+    clean_csv(args.input, args.output, args.chunksize, args.accuracy)
+
+
+if __name__ == '__main__':
+    main()